@@ -0,0 +1,308 @@
+"""
+An asyncio front end for Country, for services that must not block
+their event loop while tours are being computed.
+
+AsyncCountry runs each query on a thread pool shared by every
+AsyncCountry (or on an executor of your choosing), one query per
+Country at a time, and coalesces identical queries that are in flight
+at the same moment into a single computation. serve() exposes the same
+queries over a local JSON-lines TCP server, mainly so they can be
+exercised end to end in tests.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+
+_shared_executor = None
+_shared_executor_lock = threading.Lock()
+
+
+def shared_executor():
+    """The thread pool that AsyncCountry uses by default, created on first use."""
+    global _shared_executor
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1, thread_name_prefix="async_country"
+            )
+        return _shared_executor
+
+
+class _SharedCall:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+
+
+class AsyncCountry:
+    """
+    Awaitable versions of the Country queries.
+
+    Parameters
+    ----------
+    country : Country
+    executor : concurrent.futures.Executor, optional
+        Where the queries run. It must run them in this process (a
+        thread pool, say), since they work on the Country in place. By
+        default, shared_executor().
+
+    Notes
+    -----
+    Queries run one at a time, in the order they were made, and an
+    AsyncCountry must be used from a single event loop.
+
+    Every query takes an optional timeout in seconds, after which it
+    raises TimeoutError. A query whose callers have all timed out or
+    been cancelled is dropped if it has not started yet; once running,
+    it finishes in the background (a Country cannot be interrupted
+    midway), and its result is discarded.
+
+    Identical queries made while one is in flight share its result
+    object, so callers must not modify it.
+    """
+
+    def __init__(self, country, executor=None):
+        self.country = country
+        self._executor = executor
+        # A Country fills its caches as it goes, so it answers one query
+        # at a time. Queries wait their turn here, on the event loop, and
+        # only go to the executor once the Country is free: a waiting
+        # query holds no thread, and can still be dropped.
+        self._country_lock = asyncio.Lock()
+        self._in_flight = {}
+        self.n_computed = 0
+        self.n_coalesced = 0
+
+    async def _call(self, function, args, kwargs):
+        async with self._country_lock:
+            loop = asyncio.get_running_loop()
+            executor = self._executor if self._executor is not None else shared_executor()
+            future = loop.run_in_executor(executor, partial(function, *args, **kwargs))
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The query cannot be stopped once started, so the Country
+                # stays busy until it finishes.
+                await asyncio.wait([future])
+                if not future.cancelled():
+                    future.exception()
+                raise
+
+    async def _run(self, key, timeout, function, *args, **kwargs):
+        shared = self._in_flight.get(key)
+        if shared is None:
+            future = asyncio.ensure_future(self._call(function, args, kwargs))
+            shared = self._in_flight[key] = _SharedCall(future)
+            future.add_done_callback(lambda done: self._finished(key, shared))
+            self.n_computed += 1
+        else:
+            self.n_coalesced += 1
+
+        shared.waiters += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(shared.future), timeout)
+        finally:
+            shared.waiters -= 1
+            if shared.waiters == 0 and not shared.future.done():
+                # Nobody wants the answer any more; this stops the
+                # computation if it has not been started.
+                shared.future.cancel()
+
+    def _finished(self, key, shared):
+        if self._in_flight.get(key) is shared:
+            del self._in_flight[key]
+        if not shared.future.cancelled():
+            # Mark any error as retrieved, even if every caller gave up.
+            shared.future.exception()
+
+    async def travel_times(self, start_ids, end_ids, dtype=np.float64, timeout=None):
+        """Country.travel_times, awaited."""
+        start_ids, end_ids = np.asarray(start_ids), np.asarray(end_ids)
+        key = (
+            "travel_times",
+            start_ids.shape, start_ids.dtype.str, start_ids.tobytes(),
+            end_ids.shape, end_ids.dtype.str, end_ids.tobytes(),
+            np.dtype(dtype).str,
+        )
+        return await self._run(key, timeout, self.country.travel_times, start_ids, end_ids, dtype)
+
+    async def fastest_trip_from(self, current_location, potential_locations=None, timeout=None):
+        """Country.fastest_trip_from, awaited."""
+        if isinstance(potential_locations, np.ndarray):
+            candidates = (potential_locations.dtype.str, potential_locations.tobytes())
+        elif potential_locations is not None:
+            potential_locations = list(potential_locations)
+            candidates = tuple(potential_locations)
+        else:
+            candidates = None
+        key = ("fastest_trip_from", current_location, candidates)
+        return await self._run(
+            key, timeout, self.country.fastest_trip_from, current_location, potential_locations
+        )
+
+    async def nn_tour(self, starting_depot, timeout=None):
+        """Country.nn_tour, awaited."""
+        return await self._run(("nn_tour", starting_depot), timeout, self.country.nn_tour, starting_depot)
+
+    async def best_depot_site(self, timeout=None, **options):
+        """
+        Country.best_depot_site(display=False, **options), awaited.
+        options may include workers, improve, time_budget, exact,
+        memory_limit and prune; time_budget bounds each tour's search, where
+        timeout bounds the whole query.
+        """
+        options["display"] = False
+        # Canonical text, so options with unhashable values coalesce too.
+        key = ("best_depot_site", json.dumps(options, sort_keys=True, default=repr))
+        return await self._run(key, timeout, self.country.best_depot_site, **options)
+
+
+def _location_key(location):
+    return [location.name, location.region]
+
+
+def _resolve(country, key):
+    # A location is named on the wire by its [name, region] pair, and a
+    # settlement may also be given by its index in country.settlements.
+    if isinstance(key, int) and not isinstance(key, bool):
+        if not 0 <= key < country.n_settlements:
+            raise IndexError(f"Index {key} is out of range for settlements.")
+        return country._location(int(country._settlement_ids[key]))
+    name, region = key
+    location_id = country._index.get((name, region))
+    if location_id is None:
+        raise ValueError(f"No location {name} in {region}")
+    return country._location(location_id)
+
+
+# What clients of serve() may ask best_depot_site for. They cannot start
+# worker processes, and searches are bounded in time and memory.
+_SERVER_FLAGS = ("improve", "exact", "prune")
+_SERVER_MAX_TIME_BUDGET = 60.0
+_SERVER_MAX_MEMORY_LIMIT = 256 * 2**20
+
+
+def _server_options(params):
+    unknown = set(params) - {*_SERVER_FLAGS, "time_budget", "memory_limit"}
+    if unknown:
+        raise ValueError(f"Unsupported best_depot_site options: {', '.join(sorted(unknown))}")
+    options = {}
+    for flag in _SERVER_FLAGS:
+        if flag in params:
+            if not isinstance(params[flag], bool):
+                raise TypeError(f"{flag} must be true or false")
+            options[flag] = params[flag]
+    if options.get("improve") or options.get("exact"):
+        time_budget = float(params.get("time_budget", _SERVER_MAX_TIME_BUDGET))
+        options["time_budget"] = min(time_budget, _SERVER_MAX_TIME_BUDGET)
+    if "memory_limit" in params:
+        options["memory_limit"] = min(int(params["memory_limit"]), _SERVER_MAX_MEMORY_LIMIT)
+    return options
+
+
+async def _answer(service, request):
+    method, params = request["method"], request.get("params", {})
+    timeout = params.pop("timeout", None)
+    country = service.country
+
+    if method == "travel_times":
+        times = await service.travel_times(params["start_ids"], params["end_ids"], timeout=timeout)
+        return times.tolist()
+    if method == "fastest_trip_from":
+        candidates = params.get("potential_locations")
+        if candidates is not None:
+            candidates = [_resolve(country, key) for key in candidates]
+        location, trip_time = await service.fastest_trip_from(
+            _resolve(country, params["location"]), candidates, timeout=timeout
+        )
+        return None if location is None else {"location": _location_key(location), "time": trip_time}
+    if method == "nn_tour":
+        tour, tour_time = await service.nn_tour(_resolve(country, params["depot"]), timeout=timeout)
+        return {"tour": [_location_key(location) for location in tour], "time": tour_time}
+    if method == "best_depot_site":
+        return _location_key(await service.best_depot_site(timeout=timeout, **_server_options(params)))
+    raise ValueError(f"Unknown method {method!r}")
+
+
+async def serve(country, host="127.0.0.1", port=0, executor=None):
+    """
+    Starts a server answering Country queries over TCP, one JSON object
+    per line each way.
+
+    A request is {"id": ..., "method": ..., "params": {...}}, where method
+    is travel_times (params start_ids and end_ids), fastest_trip_from
+    (location and optionally potential_locations), nn_tour (depot) or
+    best_depot_site (options improve, exact and prune, time_budget of up
+    to 60 s per tour, which improve and exact always get, and
+    memory_limit of up to 256 MiB), and params may add a timeout in
+    seconds. Locations are given and returned as [name, region]. The
+    reply is {"id": ..., "result": ...} or {"id": ..., "error": message}.
+    Requests on one connection are answered as they complete, not
+    necessarily in order, and identical requests in flight at the same
+    time are computed once.
+
+    Returns
+    -------
+    asyncio.Server
+        Already serving. Its port, if port=0 picked a free one, is
+        server.sockets[0].getsockname()[1].
+    """
+    service = AsyncCountry(country, executor)
+
+    async def handle(reader, writer):
+        write_lock = asyncio.Lock()
+        pending = set()
+
+        async def respond(line):
+            request = {}
+            try:
+                request = json.loads(line)
+                reply = {"id": request.get("id"), "result": await _answer(service, request)}
+            except Exception as error:
+                reply = {"id": request.get("id"), "error": f"{type(error).__name__}: {error}"}
+            async with write_lock:
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                task = asyncio.create_task(respond(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending)
+        finally:
+            for task in pending:
+                task.cancel()
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    server.service = service
+    return server
+
+
+async def request(port, method, host="127.0.0.1", **params):
+    """
+    Sends one request to a server started by serve() and returns its
+    result, raising RuntimeError with the server's message if it failed.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(json.dumps({"id": 0, "method": method, "params": params}).encode() + b"\n")
+        await writer.drain()
+        reply = json.loads(await reader.readline())
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    if "error" in reply:
+        raise RuntimeError(reply["error"])
+    return reply["result"]
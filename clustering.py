@@ -0,0 +1,75 @@
+"""
+k-medoids clustering over a precomputed cost matrix, used to split a
+Country's settlements between several depots.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+def k_medoids(costs, k, max_iterations=100):
+    """
+    Chooses k of the rows of costs as medoids, so that the total cost of
+    assigning every column to its cheapest medoid is (locally) minimal.
+
+    The medoids are picked greedily (PAM's BUILD step), then improved by
+    swapping one medoid for one unchosen row at a time, always taking the
+    swap that lowers the total cost the most (PAM's SWAP step), until no
+    swap helps or max_iterations swaps have been made. Ties go to the
+    lowest row, so the result is deterministic.
+
+    Parameters
+    ----------
+    costs : ndarray of float, shape (n_candidates, n_points)
+        costs[i, j] is the cost of serving point j from candidate i.
+    k : int
+        Number of medoids, 1 <= k <= n_candidates.
+    max_iterations : int, default: 100
+
+    Returns
+    -------
+    medoids : ndarray of int
+        The chosen rows, in increasing order.
+    assignment : ndarray of int
+        For each point, the position in medoids of the medoid serving it.
+    """
+    costs = np.asarray(costs, dtype=float)
+    n_candidates = costs.shape[0]
+    if not 1 <= k <= n_candidates:
+        raise ValueError(f"k must be between 1 and {n_candidates}, not {k}.")
+
+    chosen = np.zeros(n_candidates, dtype=bool)
+    nearest = np.full(costs.shape[1], np.inf)
+    for _ in range(k):
+        totals = np.minimum(costs, nearest).sum(axis=1)
+        totals[chosen] = np.inf
+        best = int(np.argmin(totals))
+        chosen[best] = True
+        nearest = np.minimum(nearest, costs[best])
+
+    for _ in range(max_iterations):
+        medoids = np.flatnonzero(chosen)
+        medoid_costs = costs[medoids]
+        order = np.argsort(medoid_costs, axis=0, kind="stable")
+        first = np.take_along_axis(medoid_costs, order[:1], axis=0)[0]
+        second = np.take_along_axis(medoid_costs, order[1:2], axis=0)[0] if k > 1 else np.full_like(first, np.inf)
+        current = first.sum()
+
+        best_total, best_swap = current, None
+        candidates = np.flatnonzero(~chosen)
+        for position, medoid in enumerate(medoids):
+            # Cost of each point once this medoid is gone, before adding the
+            # candidate that replaces it.
+            without = np.where(order[0] == position, second, first)
+            totals = np.minimum(costs[candidates], without).sum(axis=1)
+            if len(totals) and totals.min() < best_total:
+                best_total = totals.min()
+                best_swap = medoid, candidates[int(np.argmin(totals))]
+        if best_swap is None:
+            break
+        chosen[best_swap[0]] = False
+        chosen[best_swap[1]] = True
+
+    medoids = np.flatnonzero(chosen)
+    return medoids, np.argmin(costs[medoids], axis=0)
@@ -1,8 +1,15 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, List, Optional
+from abc import ABCMeta
+from typing import TYPE_CHECKING, List, NamedTuple, Optional
 
-from plotting_utilities import plot_country, plot_path
+from clustering import k_medoids
+from exact_tour import branch_and_bound, held_karp, held_karp_memory
+from instrumentation import Instrumentation, recording
+from plotting_utilities import plot_country, plot_path, polar_to_xy
+from spatial_index import GridIndex
+from tour_improvement import improve_tour
+from travel_time_store import TileCacheInfo, TiledTravelTimes
 
 if TYPE_CHECKING:
     from pathlib import Path
@@ -12,6 +19,14 @@ if TYPE_CHECKING:
 import numpy as np
 import warnings
 import math
+import gc
+import hashlib
+import re
+import instrumentation
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial, wraps
+from multiprocessing import shared_memory
 
 def travel_time(
     distance,
@@ -19,45 +34,1067 @@ def travel_time(
     locations_in_dest_region,
     speed = 4.75,
 ):
-    r_diff = 1 if different_regions else 0
+    if np.ndim(different_regions):
+        r_diff = np.asarray(different_regions, dtype=int)
+    else:
+        r_diff = 1 if different_regions else 0
     travel_time_using = (distance / speed) * (1 + (r_diff * locations_in_dest_region) / 10) / 3600
+    if instrumentation.enabled:
+        instrumentation.count("travel_time", np.size(travel_time_using))
     return travel_time_using
 
-class Location:
-    def __init__(self, name, region, r, theta, depot):
-        if not isinstance(name, str):
-            raise TypeError("The 'name' must be a string.")
-        if not isinstance(region, str):
-            raise TypeError("The 'region' must be a string.")
-        
-        formatted_name = " ".join([word.capitalize() for word in name.split()])
-        formatted_region = " ".join([word.capitalize() for word in region.split()])
-        
-        if name != formatted_name:
-            warnings.warn(f"The 'name' value '{name}' was reformatted to '{formatted_name}'.")
-        if region != formatted_region:
-            warnings.warn(f"The 'region' value '{region}' was reformatted to '{formatted_region}'.")
 
-        self.name = formatted_name
-        self.region = formatted_region
+# Batched travel times are computed this many at a time, so the float64
+# intermediates stay in cache whatever the size of the batch.
+_BATCH_CHUNK = 1 << 14
 
-        try:
-            self.r = float(r)
-            self.theta = float(theta)
-        except ValueError:
-            raise TypeError("The 'r' and 'theta' values must be convertible to float.")
 
-        if self.r < 0:
-            raise ValueError("The 'r' value (polar radius) must be non-negative.")
+def _batched(compute, inputs, input_dtypes, dtype=np.float64, out=None):
+    # Runs compute over matching, broadcast chunks of inputs, writing
+    # (and if need be casting) each chunk of results into out.
+    iterator = np.nditer(
+        [*inputs, out],
+        flags=["external_loop", "buffered", "zerosize_ok", "refs_ok"],
+        op_flags=[["readonly"]] * len(inputs) + [["writeonly", "allocate", "no_broadcast"]],
+        op_dtypes=[*input_dtypes, out.dtype if out is not None else np.dtype(dtype)],
+        casting="same_kind",
+        buffersize=_BATCH_CHUNK,
+    )
+    with iterator:
+        for *chunks, result in iterator:
+            result[...] = compute(*chunks)
+        return iterator.operands[-1]
 
-        if not (-np.pi <= self.theta <= math.pi):
-            raise ValueError("The 'theta' value must be within the range -π ≤ θ ≤ π.")
 
-        if not isinstance(depot, bool):
-            raise TypeError("The 'depot' value must be a boolean.")
-        
-        self._depot = depot
-    
+def travel_times(
+    distance,
+    different_regions,
+    locations_in_dest_region,
+    speed=4.75,
+    dtype=np.float64,
+    out=None,
+):
+    """
+    travel_time over whole arrays of trips in one pass.
+
+    The arguments broadcast against each other, and in float64 every
+    result is exactly what travel_time returns for that trip.
+
+    Parameters
+    ----------
+    distance : array_like of float
+    different_regions : array_like of bool
+    locations_in_dest_region : array_like of int
+    speed : float, default: 4.75
+    dtype : {numpy.float64, numpy.float32}, default: numpy.float64
+        Type of the returned array. float32 results are the float64 ones
+        rounded, computed chunk by chunk without a float64 copy of the
+        whole batch.
+    out : ndarray, optional
+        Array to write the results to, which must have the broadcast
+        shape of the arguments; its dtype overrides dtype.
+
+    Returns
+    -------
+    ndarray
+        Travel times in hours.
+    """
+    def compute(distance, r_diff, locations_in_dest_region):
+        if instrumentation.enabled:
+            instrumentation.count("travel_time", len(distance))
+        return (distance / speed) * (1 + (r_diff * locations_in_dest_region) / 10) / 3600
+
+    # Any truthy flag means different regions, as for travel_time.
+    different_regions = np.asarray(different_regions) != 0
+    return _batched(
+        compute,
+        [distance, different_regions, locations_in_dest_region],
+        [np.float64, np.int_, None],
+        dtype,
+        out,
+    )
+
+
+# Countries up to this size keep a full travel-time matrix for their tours;
+# beyond it, each row is computed on the fly to keep memory at O(n).
+_MATRIX_MAX_LOCATIONS = 2_500
+
+# Without a matrix, tours over at least this many settlements search a
+# spatial grid for each next stop instead of scanning every candidate.
+_SPATIAL_INDEX_MIN_SETTLEMENTS = 10_000
+
+
+def _distance(r, theta, dest_r, dest_theta, xp=np):
+    """
+    Law-of-cosines distance between points in polar coordinates, the one
+    kernel behind Location.distance_to (with xp=math, for floats) and
+    every batched travel time (xp=numpy, for arrays), so that all of them
+    agree to the last bit.
+
+    r * r rather than r**2, since a float's r**2 goes through pow(), which
+    can be an ulp away from the exact square numpy takes of arrays. The
+    cached Cartesian coordinates are not used here: the distance they give
+    is not bit-for-bit the same, so they only ever pre-screen candidates.
+    """
+    return xp.sqrt(r * r + dest_r * dest_r - 2 * r * dest_r * xp.cos(theta - dest_theta))
+
+
+def _travel_times_from(r, theta, region_code, dest_r, dest_theta, dest_region_codes, dest_region_counts):
+    distance = _distance(r, theta, dest_r, dest_theta)
+    return travel_time(distance, dest_region_codes != region_code, dest_region_counts)
+
+
+# Exact tours use Held-Karp while its table fits in this many bytes, and
+# branch and bound beyond that.
+_EXACT_MEMORY_LIMIT = 256 * 2**20
+
+# Branch and bound takes exponential time, so without a time budget it is
+# only run on up to this many settlements.
+_EXACT_MAX_UNBUDGETED_SETTLEMENTS = 30
+
+# fastest_trip_from remembers this many (origin, candidates) answers, and
+# keeps sorted neighbour lists of up to this many ids in total.
+_TRIP_CACHE_SIZE = 4096
+_SORTED_NEIGHBOURS_BUDGET = 1 << 23
+
+
+class TripCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+    sorted_origins: int
+
+
+class _LocationArrays(NamedTuple):
+    """Per-location columns the tour kernels work on, indexed by id."""
+
+    r: np.ndarray
+    theta: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    region_codes: np.ndarray
+    region_counts: np.ndarray
+    tiebreak_rank: np.ndarray
+    # (1 + region population / 10)**2: the factor a trip into each
+    # location from another region scales the squared distance by.
+    penalty: np.ndarray
+
+
+def _rounding_tolerance(arrays, origin_id, r_max_squared, penalty_max):
+    # Bound on how far apart the Cartesian estimate of
+    # (distance * penalty)**2 and the exact law-of-cosines value can be.
+    eps = np.finfo(float).eps
+    return 64 * eps * (arrays.r[origin_id] ** 2 + r_max_squared) * penalty_max, 64 * eps
+
+
+def _fastest_times(arrays, origin_id, ids):
+    """Exact travel times from origin_id to each of ids."""
+    r, theta, region_codes, region_counts = arrays.r, arrays.theta, arrays.region_codes, arrays.region_counts
+    return ids, _travel_times_from(
+        r[origin_id], theta[origin_id], region_codes[origin_id],
+        r[ids], theta[ids], region_codes[ids], region_counts[region_codes[ids]],
+    )
+
+
+def _fastest_of(arrays, origin_id, ids):
+    """The ids, and their exact travel times, that tie for the fastest trip."""
+    ids, times = _fastest_times(arrays, origin_id, ids)
+    fastest = times == times.min()
+    return ids[fastest], times[fastest]
+
+
+def _shortlist_fastest_of(arrays, matrix, origin_id, ids):
+    """
+    _fastest_of, with the times read from matrix if there is one. Times
+    rounded to float32 keep their order, so the exact fastest are among
+    those tied once rounded, and only those are timed exactly.
+    """
+    if matrix is None:
+        return _fastest_of(arrays, origin_id, ids)
+    times = matrix[origin_id, ids]
+    fastest = times == times.min()
+    if matrix.dtype != np.float64:
+        return _fastest_of(arrays, origin_id, ids[fastest])
+    return ids[fastest], times[fastest]
+
+
+def _screened_fastest_of(arrays, origin_id, ids, matrix=None):
+    """
+    _fastest_of, for many ids: they are first ranked by the Cartesian
+    estimate of (distance * region penalty)**2 from the cached x and y,
+    and only those within rounding error of the best get exact times
+    (see _shortlist_fastest_of).
+    """
+    key = (arrays.x[ids] - arrays.x[origin_id]) ** 2 + (arrays.y[ids] - arrays.y[origin_id]) ** 2
+    penalty = arrays.penalty[ids]
+    np.multiply(key, penalty, out=key, where=arrays.region_codes[ids] != arrays.region_codes[origin_id])
+    instrumentation.count("distance_to", len(ids))
+
+    r_max = float(arrays.r[ids].max())
+    abs_tol, rel_tol = _rounding_tolerance(arrays, origin_id, r_max * r_max, float(penalty.max()))
+    best_key = key.min()
+    return _shortlist_fastest_of(arrays, matrix, origin_id, ids[key <= best_key + abs_tol + rel_tol * best_key])
+
+
+class _RowScanner:
+    """
+    Unvisited settlements kept as a compacted array, with the visited ones
+    swap-removed. Each query scans one whole travel-time row: taken from
+    the matrix if there is one, otherwise ranked by a cheap Cartesian
+    estimate of (distance * region penalty)**2 so that only the few
+    candidates within rounding error of the best need exact times.
+    """
+
+    def __init__(self, settlement_ids, arrays, matrix=None):
+        self._arrays = arrays
+        self._matrix = matrix
+        self._n_unvisited = len(settlement_ids)
+
+        self._unvisited = np.array(settlement_ids, dtype=np.intp)
+        self._position = np.full(len(arrays.r), -1, dtype=np.intp)
+        self._position[self._unvisited] = np.arange(self._n_unvisited)
+        self._x = arrays.x[self._unvisited]
+        self._y = arrays.y[self._unvisited]
+        self._codes = arrays.region_codes[self._unvisited]
+        self._penalty = arrays.penalty[self._unvisited]
+        self._columns = (self._unvisited, self._x, self._y, self._codes, self._penalty)
+
+        self._r_max_squared = float(np.max(arrays.r, initial=0.0)) ** 2
+        self._penalty_max = float(np.max(self._penalty, initial=1.0))
+        self._estimate = np.empty(self._n_unvisited)
+        self._scratch = np.empty(self._n_unvisited)
+        self._other_region = np.empty(self._n_unvisited, dtype=bool)
+
+    def __len__(self):
+        return self._n_unvisited
+
+    def fastest_from(self, origin_id):
+        n = self._n_unvisited
+        candidates = self._unvisited[:n]
+        if self._matrix is not None:
+            return _shortlist_fastest_of(self._arrays, self._matrix, origin_id, candidates)
+
+        arrays = self._arrays
+        key, other, penalised = self._estimate[:n], self._scratch[:n], self._other_region[:n]
+        np.subtract(self._x[:n], arrays.x[origin_id], out=key)
+        np.multiply(key, key, out=key)
+        np.subtract(self._y[:n], arrays.y[origin_id], out=other)
+        np.multiply(other, other, out=other)
+        np.add(key, other, out=key)
+        np.not_equal(self._codes[:n], arrays.region_codes[origin_id], out=penalised)
+        np.multiply(key, self._penalty[:n], out=key, where=penalised)
+        instrumentation.count("distance_to", n)
+
+        abs_tol, rel_tol = _rounding_tolerance(arrays, origin_id, self._r_max_squared, self._penalty_max)
+        best_key = key.min()
+        return _fastest_of(arrays, origin_id, candidates[key <= best_key + abs_tol + rel_tol * best_key])
+
+    def remove(self, location_id):
+        position = self._position[location_id]
+        self._n_unvisited -= 1
+        last = self._n_unvisited
+        self._position[self._unvisited[last]] = position
+        self._position[location_id] = -1
+        for column in self._columns:
+            column[position] = column[last]
+
+
+class _GridScanner:
+    """
+    Unvisited settlements kept in a GridIndex, so each query only looks
+    at the settlements around the current location. The region penalty
+    is at least 1, so plain distance bounds the search. The few candidates
+    it finds are timed from matrix (a tiled store), if given.
+    """
+
+    def __init__(self, settlement_ids, arrays, matrix=None):
+        self._arrays = arrays
+        self._matrix = matrix
+        with instrumentation.phase("index_build"):
+            self._index = GridIndex(arrays.x, arrays.y, settlement_ids)
+        self._penalty = arrays.penalty
+        self._r_max_squared = float(np.max(arrays.r, initial=0.0)) ** 2
+        self._penalty_max = float(np.max(self._penalty, initial=1.0))
+
+    def __len__(self):
+        return len(self._index)
+
+    def fastest_from(self, origin_id):
+        arrays = self._arrays
+        origin_code = arrays.region_codes[origin_id]
+        abs_tol, rel_tol = _rounding_tolerance(arrays, origin_id, self._r_max_squared, self._penalty_max)
+
+        def weights(ids):
+            # Called once with every location whose distance was estimated
+            instrumentation.count("distance_to", len(ids))
+            return np.where(arrays.region_codes[ids] != origin_code, self._penalty[ids], 1.0)
+
+        ids, _ = self._index.nearest(
+            arrays.x[origin_id],
+            arrays.y[origin_id],
+            weights=weights,
+            abs_tol=abs_tol,
+            rel_tol=rel_tol,
+        )
+        return _shortlist_fastest_of(arrays, self._matrix, origin_id, ids)
+
+    def remove(self, location_id):
+        self._index.remove(location_id)
+
+
+class _SequentialSum:
+    """Leg times added up left to right, as the tour is travelled."""
+
+    __slots__ = ("total",)
+
+    def __init__(self, total=0):
+        self.total = total
+
+    def add(self, value):
+        self.total += value
+        return self.total
+
+
+class _CompensatedSum:
+    """
+    Leg times added up with Neumaier's compensated summation, so that the
+    total of a very long tour carries no more than one rounding error.
+    """
+
+    __slots__ = ("_sum", "_compensation")
+
+    def __init__(self, total=0):
+        self._sum = total
+        self._compensation = 0.0
+
+    def add(self, value):
+        new_sum = self._sum + value
+        if abs(self._sum) >= abs(value):
+            self._compensation += (self._sum - new_sum) + value
+        else:
+            self._compensation += (value - new_sum) + self._sum
+        self._sum = new_sum
+        return self.total
+
+    @property
+    def total(self):
+        return self._sum + self._compensation
+
+
+# How tours break ties between equally fast trips, and add up their legs.
+_TIE_BREAKS = ("name", "position")
+_TOUR_SUMS = {"sequential": _SequentialSum, "compensated": _CompensatedSum}
+
+
+def _tour_policies(arrays, tie_break, accumulate):
+    """
+    The tie-break ranks and sum class for the named policies: ties go to
+    the first by (name, region), or by position in the Country, and leg
+    times are summed sequentially or with compensation.
+    """
+    if tie_break not in _TIE_BREAKS:
+        raise ValueError(f"tie_break must be one of {_TIE_BREAKS}, not {tie_break!r}.")
+    if accumulate not in _TOUR_SUMS:
+        raise ValueError(f"accumulate must be one of {tuple(_TOUR_SUMS)}, not {accumulate!r}.")
+    tie_rank = arrays.tiebreak_rank if tie_break == "name" else np.arange(len(arrays.r))
+    return tie_rank, _TOUR_SUMS[accumulate]
+
+
+def _nn_tour_legs(start_id, scanner, arrays, home_id=None, tie_rank=None):
+    """
+    Nearest-neighbour tour over integer location ids, decided one leg at
+    a time. This is the one tour kernel behind nn_tour,
+    nearest_neighbour_path, their streaming versions and the depot
+    sweeps.
+
+    scanner holds the unvisited settlements and reports which of them tie
+    for the fastest trip from a given location; ties go to the lowest
+    tie_rank (by default arrays.tiebreak_rank: name, then region). Each
+    settlement is removed from scanner as it is chosen.
+
+    Yields
+    ------
+    location_id : int
+        Each settlement in the order it is visited, then home_id (by
+        default, start_id) for the return leg.
+    leg_time : float
+        Time of the leg into it.
+    """
+    if tie_rank is None:
+        tie_rank = arrays.tiebreak_rank
+    current = start_id
+    for _ in range(len(scanner)):
+        ids, times = scanner.fastest_from(current)
+        choice = 0
+        if len(ids) > 1:
+            choice = int(np.argmin(tie_rank[ids]))
+        current = int(ids[choice])
+        scanner.remove(current)
+        yield current, float(times[choice])
+
+    home_id = start_id if home_id is None else home_id
+    _, return_time = _fastest_of(arrays, current, np.array([home_id]))
+    yield home_id, float(return_time[0])
+
+
+def _nn_tour_ids(
+    start_id, scanner, arrays, home_id=None, total_time=0, cutoff=None, bound=None, tie_rank=None, tour_sum=None
+):
+    """
+    Nearest-neighbour tour over integer location ids (see _nn_tour_legs),
+    with its leg times added up by tour_sum (by default, _SequentialSum).
+    To finish a partly completed tour, start from its last stop, pass the
+    depot as home_id and the time so far as total_time.
+
+    To abandon a tour that cannot finish within cutoff, pass a
+    _TourLowerBound for it; the tour is given up as soon as its time so
+    far plus the bound on the rest exceeds cutoff.
+
+    Returns
+    -------
+    order : ndarray of int
+        The settlement ids in the order they are visited.
+    total_time : float
+        Time for the whole tour, including the return to home_id (by
+        default, start_id).
+
+    Both are None if the tour was abandoned.
+    """
+    with instrumentation.phase("tour_construction"):
+        order = np.empty(len(scanner), dtype=np.intp)
+        legs = _nn_tour_legs(start_id, scanner, arrays, home_id, tie_rank)
+        total = (tour_sum or _SequentialSum)(total_time)
+        current = start_id
+
+        for step in range(len(order)):
+            if cutoff is not None and total.total + bound.remaining(current) > cutoff:
+                return None, None
+            current, leg_time = next(legs)
+            total.add(leg_time)
+            order[step] = current
+            if cutoff is not None:
+                bound.visit(current)
+
+        _, return_time = next(legs)
+        total.add(return_time)
+
+    return order, total.total
+
+
+def _tour_scanner(settlement_ids, arrays, matrix=None):
+    rows = _scannable(matrix, len(settlement_ids))
+    if rows is None and (matrix is not None or len(settlement_ids) >= _SPATIAL_INDEX_MIN_SETTLEMENTS):
+        # A tiled store too small for whole rows still times the
+        # candidates around each stop.
+        return _GridScanner(settlement_ids, arrays, matrix)
+    return _RowScanner(settlement_ids, arrays, rows)
+
+
+# Pruned tours are only abandoned once their bound exceeds the best time
+# by this fraction, far more than the rounding error of summing the bound.
+_PRUNING_SLACK = 1e-9
+
+
+def _entry_time_bounds(arrays, settlement_ids, matrix=None):
+    """
+    Lower bounds on the time of any trip into each settlement from
+    another settlement, and from a settlement in another region.
+
+    With a matrix, these are the fastest such trips. Otherwise they come
+    from the straight-line distance to the nearest other settlement (and
+    the nearest other settlement in the same region), found in
+    GridIndexes and allowing for the Cartesian estimate's rounding error.
+
+    Returns
+    -------
+    entry_times, cross_region_times : ndarray of float
+        Indexed by location id; inf where there is no such trip.
+    """
+    n_locations = len(arrays.r)
+    codes = arrays.region_codes
+    entry_times = np.full(n_locations, np.inf)
+    cross_region_times = np.full(n_locations, np.inf)
+    settlement_ids = np.asarray(settlement_ids, dtype=np.intp)
+    n_settlements = len(settlement_ids)
+
+    matrix = _scannable(matrix, n_settlements)
+    if matrix is not None:
+        destination_codes = codes[settlement_ids]
+        entry, cross_region = entry_times[settlement_ids], cross_region_times[settlement_ids]
+        chunk = max(1, 2**20 // max(n_settlements, 1))
+        for first in range(0, n_settlements, chunk):
+            sources = settlement_ids[first:first + chunk]
+            rows = matrix[sources[:, None], settlement_ids]
+            rows[np.arange(len(sources)), np.arange(first, first + len(sources))] = np.inf
+            np.minimum(entry, rows.min(axis=0, initial=np.inf), out=entry)
+            rows[codes[sources, None] == destination_codes] = np.inf
+            np.minimum(cross_region, rows.min(axis=0, initial=np.inf), out=cross_region)
+        if _exact(matrix) is None:
+            # A float32 time is at most half an ulp above the exact one.
+            entry *= 1 - 2.0**-23
+            cross_region *= 1 - 2.0**-23
+        entry_times[settlement_ids], cross_region_times[settlement_ids] = entry, cross_region
+        return entry_times, cross_region_times
+
+    r_max_squared = float(np.max(arrays.r, initial=0.0)) ** 2
+
+    def nearest_distances(ids):
+        # Distance from each of ids to the nearest other one of them.
+        with instrumentation.phase("index_build"):
+            index = GridIndex(arrays.x, arrays.y, ids)
+        squared = np.full(len(ids), np.inf)
+        for position, location_id in enumerate(ids.tolist()):
+            x, y = arrays.x[location_id], arrays.y[location_id]
+            nearest = index.k_nearest(x, y, 2)
+            nearest = nearest[nearest != location_id]
+            if len(nearest):
+                squared[position] = (arrays.x[nearest[0]] - x) ** 2 + (arrays.y[nearest[0]] - y) ** 2
+        instrumentation.count("distance_to", len(ids))
+        abs_tol, _ = _rounding_tolerance(arrays, ids, r_max_squared, 1.0)
+        return np.sqrt(np.maximum(squared - abs_tol, 0.0)) * (1 - _PRUNING_SLACK)
+
+    # The nearest settlement of any region is no further than the nearest
+    # one of another region.
+    cross_region_times[settlement_ids] = travel_time(
+        nearest_distances(settlement_ids), True, arrays.region_counts[codes[settlement_ids]]
+    )
+    by_region = settlement_ids[np.argsort(codes[settlement_ids], kind="stable")]
+    for region_ids in np.split(by_region, np.flatnonzero(np.diff(codes[by_region])) + 1):
+        if len(region_ids):
+            entry_times[region_ids] = travel_time(nearest_distances(region_ids), False, 0)
+    np.minimum(entry_times, cross_region_times, out=entry_times)
+    return entry_times, cross_region_times
+
+
+class _TourLowerBound:
+    """
+    Lower bound on the time still needed to finish a tour from home_id:
+    the fastest trip into every location still to be entered (the
+    unvisited settlements and home), plus, for every region still to be
+    entered from outside, the least that entering it from another region
+    adds to that.
+
+    entry_times and cross_region_times are as from _entry_time_bounds,
+    and outbound_times and return_times the times from home to each
+    settlement and back.
+    """
+
+    def __init__(
+        self, entry_times, cross_region_times, arrays, settlement_ids, home_id, outbound_times, return_times
+    ):
+        codes = arrays.region_codes
+        home_code = codes[home_id]
+        from_other_region = codes[settlement_ids] != home_code
+        entry_times = entry_times.copy()
+        entry_times[settlement_ids] = np.minimum(entry_times[settlement_ids], outbound_times)
+        entry_times[home_id] = np.min(return_times, initial=np.inf)
+        cross_region_times = cross_region_times.copy()
+        cross_region_times[settlement_ids] = np.minimum(
+            cross_region_times[settlement_ids], np.where(from_other_region, outbound_times, np.inf)
+        )
+        cross_region_times[home_id] = np.min(return_times[from_other_region], initial=np.inf)
+
+        n_regions = len(arrays.region_counts)
+        ids = np.append(settlement_ids, home_id)
+        extra = np.full(n_regions, np.inf)
+        with np.errstate(invalid="ignore"):
+            np.minimum.at(extra, codes[ids], np.maximum(cross_region_times[ids] - entry_times[ids], 0.0))
+        self._extra = np.where(np.isfinite(extra), extra, 0.0).tolist()
+
+        self._entry_times = entry_times
+        self._codes = codes
+        self._to_enter = np.bincount(codes[ids], minlength=n_regions).tolist()
+        self._total = float(entry_times[ids].sum())
+        self._total += sum(extra for extra, n in zip(self._extra, self._to_enter) if n)
+
+    def remaining(self, current_id):
+        code = self._codes[current_id]
+        return self._total - self._extra[code] if self._to_enter[code] else self._total
+
+    def visit(self, location_id):
+        code = self._codes[location_id]
+        self._total -= self._entry_times[location_id]
+        self._to_enter[code] -= 1
+        if not self._to_enter[code]:
+            self._total -= self._extra[code]
+
+
+def _spatial_order(x, y, cell_population, groups=None):
+    """
+    Location ids ordered along rows of square cells holding about
+    cell_population locations each, alternately left to right and right to
+    left, so that locations close in the order are close on the map. If
+    groups (such as region codes) are given, each group comes together.
+    """
+    n_locations = len(x)
+    if not n_locations:
+        return np.empty(0, dtype=np.intp)
+    width, height = float(np.ptp(x)), float(np.ptp(y))
+    n_cells = max(n_locations / cell_population, 1.0)
+    cell_size = max(math.sqrt(width * height / n_cells), max(width, height) / n_cells) or 1.0
+    column = np.floor((x - x.min()) / cell_size).astype(np.intp)
+    row = np.floor((y - y.min()) / cell_size).astype(np.intp)
+    keys = [np.where(row % 2, -column, column), row]
+    return np.lexsort(keys if groups is None else keys + [groups])
+
+
+def _exact(matrix):
+    # The matrix, if its times are exact (float64), else None: float32
+    # ones are only good for shortlisting candidates.
+    return matrix if matrix is not None and matrix.dtype == np.float64 else None
+
+
+def _scannable(matrix, n_ids):
+    # The matrix, unless it is a tiled store and n_ids times are too many
+    # to read through it. The store computes whole tiles, so reading more
+    # than a tile's side at a time, a row per location, would compute and
+    # spill most of the matrix unless all of it fits in memory. Such reads
+    # work as they do without a matrix.
+    if not isinstance(matrix, TiledTravelTimes) or n_ids <= matrix.tile_size or matrix.fits_in_memory:
+        return matrix
+    return None
+
+
+def _times_between(arrays, matrix, start_ids, end_ids):
+    """
+    Travel times from each of start_ids to the matching end_ids, with the
+    usual broadcasting (so start_ids[:, None] and end_ids give a block).
+    """
+    matrix = _scannable(_exact(matrix), np.broadcast(start_ids, end_ids).size)
+    if matrix is not None:
+        return matrix[start_ids, end_ids]
+    return _travel_times_from(
+        arrays.r[start_ids], arrays.theta[start_ids], arrays.region_codes[start_ids],
+        arrays.r[end_ids], arrays.theta[end_ids], arrays.region_codes[end_ids],
+        arrays.region_counts[arrays.region_codes[end_ids]],
+    )
+
+
+def _first_changed_step(depot_id, order, settlement_ids, candidates, arrays, matrix=None, changed_regions=()):
+    """
+    Number of leading steps of a cached nearest-neighbour tour (from
+    depot_id, visiting order) that still make the same choice, when the
+    only trips that may have become faster or slower are those from
+    outside changed_regions into them, and the only settlements that may
+    now win a step are those trips' destinations and the other
+    candidates.
+    """
+    n_steps = len(order)
+    if not n_steps:
+        return 0
+    codes, rank = arrays.region_codes, arrays.tiebreak_rank
+    in_changed_region = np.zeros(len(arrays.region_counts), dtype=bool)
+    in_changed_region[list(changed_regions)] = True
+
+    position = np.full(len(arrays.r), n_steps, dtype=np.intp)
+    position[order] = np.arange(n_steps)
+    candidate_positions = position[candidates]
+
+    origins = np.concatenate(([depot_id], order[:-1]))
+    choice_times = _times_between(arrays, matrix, origins, order)
+    # Steps whose own trip changed, where any unvisited settlement could
+    # now be faster, so the whole row has to be checked.
+    choice_changed = in_changed_region[codes[order]] & (codes[origins] != codes[order])
+
+    def beaten(steps, rivals, rival_positions):
+        times = _times_between(arrays, matrix, origins[steps, np.newaxis], rivals)
+        chosen = choice_times[steps, np.newaxis]
+        faster = (times < chosen) | ((times == chosen) & (rank[rivals] < rank[order[steps], np.newaxis]))
+        return (faster & (rival_positions > steps[:, np.newaxis])).any(axis=1)
+
+    chunk = max(1, 2**20 // max(len(candidates), 1))
+    for first in range(0, n_steps, chunk):
+        steps = np.arange(first, min(first + chunk, n_steps))
+        bad = steps[beaten(steps, candidates, candidate_positions)] if len(candidates) else steps[:0]
+        for step in steps[choice_changed[steps]]:
+            if len(bad) and step >= bad[0]:
+                break
+            rivals = settlement_ids[position[settlement_ids] > step]
+            if beaten(np.array([step]), rivals, position[rivals])[0]:
+                return int(step)
+        if len(bad):
+            return int(bad[0])
+    return n_steps
+
+
+def _tour_prefix_time(depot_id, prefix, arrays, matrix=None):
+    """
+    Time to travel from depot_id through prefix, summed leg by leg in the
+    same order as _nn_tour_ids does.
+    """
+    if not len(prefix):
+        return 0
+    legs = _times_between(arrays, matrix, np.concatenate(([depot_id], prefix[:-1])), prefix)
+    # cumsum adds strictly left to right, like the tour loop.
+    return float(np.cumsum(legs)[-1])
+
+
+def _leg_time_functions(arrays, matrix=None):
+    """
+    Scalar leg_time(i, j) and vectorised leg_times(i, j) over location
+    ids, as used by improve_tour.
+    """
+    if _exact(matrix) is not None:
+        return _counting_leg_time(matrix.item), lambda start_ids, end_ids: matrix[start_ids, end_ids]
+
+    def leg_times(start_ids, end_ids):
+        return _travel_times_from(
+            arrays.r[start_ids], arrays.theta[start_ids], arrays.region_codes[start_ids],
+            arrays.r[end_ids], arrays.theta[end_ids], arrays.region_codes[end_ids],
+            arrays.region_counts[arrays.region_codes[end_ids]],
+        )
+
+    r, theta = arrays.r.tolist(), arrays.theta.tolist()
+    region_codes, region_counts = arrays.region_codes.tolist(), arrays.region_counts.tolist()
+
+    # travel_time inlined, as this is called for every candidate move.
+    def leg_time(i, j):
+        distance = _distance(r[i], theta[i], r[j], theta[j], math)
+        r_diff = 1 if region_codes[i] != region_codes[j] else 0
+        return (distance / 4.75) * (1 + (r_diff * region_counts[region_codes[j]]) / 10) / 3600
+
+    return _counting_leg_time(leg_time), leg_times
+
+
+def _counting_leg_time(leg_time):
+    # Wrapped only while instrumenting, so that uninstrumented local
+    # search pays nothing per leg.
+    if not instrumentation.active():
+        return leg_time
+
+    def counted(i, j):
+        instrumentation.count("travel_time")
+        return leg_time(i, j)
+
+    return counted
+
+
+def _neighbour_lists(ids, arrays, n_neighbours, matrix=None):
+    """The n_neighbours fastest destinations among ids from each of ids."""
+    ids = np.asarray(ids, dtype=np.intp)
+    n_neighbours = min(n_neighbours, len(ids) - 1)
+    if n_neighbours < 1:
+        return {location_id: [] for location_id in ids.tolist()}
+
+    store = _exact(matrix)
+    matrix = _scannable(store, len(ids))
+    if isinstance(matrix, np.ndarray):
+        times = matrix[np.ix_(ids, ids)]
+        np.fill_diagonal(times, np.inf)
+        nearest = np.argpartition(times, n_neighbours - 1, axis=1)[:, :n_neighbours]
+        nearest = np.take_along_axis(
+            nearest, np.argsort(np.take_along_axis(times, nearest, axis=1), axis=1), axis=1
+        )
+        instrumentation.count("sort", len(ids))
+        return dict(zip(ids.tolist(), ids[nearest].tolist()))
+
+    neighbours = {}
+    if len(ids) < _SPATIAL_INDEX_MIN_SETTLEMENTS or matrix is not None:
+        for k, location_id in enumerate(ids.tolist()):
+            if matrix is not None:
+                times = matrix[location_id, ids]
+            else:
+                _, times = _fastest_times(arrays, location_id, ids)
+            times[k] = np.inf
+            nearest = np.argpartition(times, n_neighbours - 1)[:n_neighbours]
+            neighbours[location_id] = ids[nearest[np.argsort(times[nearest], kind="stable")]].tolist()
+        instrumentation.count("sort", len(ids))
+        return neighbours
+
+    # Take the closest few by straight-line distance, then rank them by
+    # travel time; the region penalty can reorder them but rarely makes
+    # a far-away location the fastest trip.
+    with instrumentation.phase("index_build"):
+        index = GridIndex(arrays.x, arrays.y, ids)
+    for location_id in ids.tolist():
+        nearest = index.k_nearest(arrays.x[location_id], arrays.y[location_id], 4 * n_neighbours + 1)
+        nearest = nearest[nearest != location_id]
+        if store is not None:
+            times = store[location_id, nearest]
+        else:
+            _, times = _fastest_times(arrays, location_id, nearest)
+        neighbours[location_id] = nearest[np.argsort(times, kind="stable")][:n_neighbours].tolist()
+    instrumentation.count("sort", len(ids))
+    return neighbours
+
+
+def _improve_tour_ids(tour_ids, arrays, matrix=None, time_budget=None, n_neighbours=8):
+    """
+    Runs improve_tour over a tour of location ids (depot first, return
+    leg implied) and returns the improved tour and its total time.
+    """
+    with instrumentation.phase("improvement"):
+        leg_time, leg_times = _leg_time_functions(arrays, matrix)
+        neighbours = _neighbour_lists(tour_ids, arrays, n_neighbours, matrix)
+        improved = improve_tour(tour_ids, leg_time, neighbours, time_budget=time_budget, leg_times=leg_times)
+
+        total_time = 0
+        for start, end in zip(improved, improved[1:] + improved[:1]):
+            total_time += leg_time(start, end)
+    return improved, total_time
+
+
+def _optimal_tour_ids(start_id, settlement_ids, arrays, matrix=None, memory_limit=None, time_budget=None):
+    """
+    Shortest tour from start_id through settlement_ids: by Held-Karp if
+    it fits in memory_limit bytes, otherwise by branch and bound from the
+    nearest-neighbour tour (warning if time_budget runs out before the
+    tour is proven optimal).
+
+    Returns
+    -------
+    order : ndarray of int
+    total_time : float
+
+    Raises
+    ------
+    ValueError
+        If branch and bound would be needed for more than
+        _EXACT_MAX_UNBUDGETED_SETTLEMENTS settlements without a
+        time_budget.
+    """
+    if memory_limit is None:
+        memory_limit = _EXACT_MEMORY_LIMIT
+    fits = held_karp_memory(len(settlement_ids)) <= memory_limit
+    if not fits and time_budget is None and len(settlement_ids) > _EXACT_MAX_UNBUDGETED_SETTLEMENTS:
+        raise ValueError(
+            f"An exact tour through {len(settlement_ids)} settlements needs a time_budget; without one, "
+            f"branch and bound is only run on up to {_EXACT_MAX_UNBUDGETED_SETTLEMENTS} settlements."
+        )
+    nodes = np.concatenate(([start_id], settlement_ids)).astype(np.intp)
+    costs = _times_between(arrays, matrix, nodes[:, np.newaxis], nodes)
+
+    if fits:
+        with instrumentation.phase("exact_search"):
+            order, total_time = held_karp(costs)
+    else:
+        nn_order, _ = _nn_tour_ids(start_id, _tour_scanner(settlement_ids, arrays, matrix), arrays)
+        node_of = {location_id: node for node, location_id in enumerate(nodes.tolist())}
+        with instrumentation.phase("exact_search"):
+            order, total_time, optimal = branch_and_bound(
+                costs, [node_of[location_id] for location_id in nn_order.tolist()], time_budget
+            )
+        if not optimal:
+            warnings.warn(
+                f"Tour from location {start_id} is the best found in {time_budget} s, not proven optimal."
+            )
+    return nodes[np.array(order, dtype=np.intp)], total_time
+
+
+def _depot_tour_time(
+    start_id, settlement_ids, arrays, matrix=None, improve=False, time_budget=None, exact=False, memory_limit=None
+):
+    if exact:
+        return _optimal_tour_ids(start_id, settlement_ids, arrays, matrix, memory_limit, time_budget)[1]
+    scanner = _tour_scanner(settlement_ids, arrays, matrix)
+    order, total_time = _nn_tour_ids(start_id, scanner, arrays)
+    if improve:
+        _, total_time = _improve_tour_ids([start_id, *order.tolist()], arrays, matrix, time_budget)
+    return total_time
+
+
+def _share_arrays(arrays):
+    """
+    Copy a dict of arrays into one block of shared memory, returning the
+    block and the (offset, shape, dtype) layout needed to view it again.
+    """
+    layout = {}
+    size = 0
+    for name, array in arrays.items():
+        size = -(-size // 64) * 64
+        layout[name] = (size, array.shape, array.dtype.str)
+        size += array.nbytes
+
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for name, array in arrays.items():
+        _view_shared_array(shm, layout[name])[...] = array
+    return shm, layout
+
+
+def _view_shared_array(shm, array_layout):
+    offset, shape, dtype = array_layout
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+
+
+_tour_worker_state = {}
+
+
+def _init_tour_worker(shm_name, layout):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    arrays = {name: _view_shared_array(shm, array_layout) for name, array_layout in layout.items()}
+    _tour_worker_state["shm"] = shm
+    _tour_worker_state["settlement_ids"] = arrays.pop("settlement_ids")
+    _tour_worker_state["matrix"] = arrays.pop("matrix", None)
+    _tour_worker_state["arrays"] = _LocationArrays(**arrays)
+
+
+def _tour_time_worker(start_id, improve=False, time_budget=None, exact=False, memory_limit=None):
+    return _depot_tour_time(
+        start_id,
+        _tour_worker_state["settlement_ids"],
+        _tour_worker_state["arrays"],
+        _tour_worker_state["matrix"],
+        improve=improve,
+        time_budget=time_budget,
+        exact=exact,
+        memory_limit=memory_limit,
+    )
+
+
+def _cluster_tour_worker(task):
+    start_id, settlement_ids = task
+    arrays = _tour_worker_state["arrays"]
+    return _nn_tour_ids(start_id, _tour_scanner(settlement_ids, arrays, _tour_worker_state["matrix"]), arrays)
+
+
+def _closest_to_point(arrays, ids, x, y, limit):
+    # The (at most) limit ids whose Cartesian positions are closest to (x, y).
+    if len(ids) <= limit:
+        return ids
+    squared = (arrays.x[ids] - x) ** 2 + (arrays.y[ids] - y) ** 2
+    return ids[np.argpartition(squared, limit - 1)[:limit]]
+
+
+def _first_member(sorted_ids, member_ids, n_locations):
+    # First of sorted_ids that is one of member_ids, scanning a growing
+    # prefix rather than the whole list. A few members are looked up by
+    # binary search, so the cost does not grow with n_locations.
+    if 8 * len(member_ids) >= n_locations:
+        is_member = np.zeros(n_locations, dtype=bool)
+        is_member[member_ids] = True
+        in_members = is_member.__getitem__
+    else:
+        members = np.sort(member_ids)
+
+        def in_members(ids):
+            found = np.minimum(np.searchsorted(members, ids), len(members) - 1)
+            return members[found] == ids
+
+    start, length = 0, 64
+    while True:
+        hits = np.flatnonzero(in_members(sorted_ids[start:start + length]))
+        if len(hits):
+            instrumentation.count("membership_check", start + int(hits[0]) + 1)
+            return int(sorted_ids[start + hits[0]])
+        start, length = start + length, 2 * length
+
+
+def _capitalize_words(text):
+    return " ".join([word.capitalize() for word in text.split()])
+
+
+# Words separated by single spaces, each starting with anything but a
+# lowercase letter and continuing without uppercase letters: ASCII text
+# that _capitalize_words leaves exactly as it is.
+_FORMATTED_WORDS = re.compile(r"[!-`{-~][!-@\[-~]*(?: [!-`{-~][!-@\[-~]*)*")
+
+
+def _validated_columns(names, regions, r, theta, depot):
+    """
+    Checks and formats whole columns of Location fields the way
+    Location.__init__ checks and formats one, raising the error it would
+    raise for the first invalid row. Each distinct name and region is
+    formatted (and warned about) once, and the numbers are checked with
+    array operations.
+
+    Returns
+    -------
+    names, regions : list of str
+    r, theta : ndarray of float
+    depot : ndarray of bool
+    """
+    names, regions = list(names), list(regions)
+    if not isinstance(depot, np.ndarray):
+        depot = list(depot)
+    n_locations = len(names)
+    depot_array = np.asarray(depot)
+    if not len(regions) == np.size(r) == np.size(theta) == depot_array.size == n_locations:
+        raise ValueError("The name, region, r, theta and depot columns must all have the same length.")
+
+    # (row, position in Location.__init__'s order of checks, error)
+    problems = []
+    column_types = []
+    for check, (values, column) in enumerate(((names, "name"), (regions, "region"))):
+        column_types.append(set(map(type, values)))
+        if column_types[-1] - {str}:
+            row = next((i for i, value in enumerate(values) if not isinstance(value, str)), None)
+            if row is not None:
+                problems.append((row, check, TypeError(f"The '{column}' must be a string.")))
+
+    r_array, theta_array = np.asarray(r), np.asarray(theta)
+    if r_array.dtype.kind in "biuf" and theta_array.dtype.kind in "biuf":
+        r_array = r_array.astype(float).reshape(-1)
+        theta_array = theta_array.astype(float).reshape(-1)
+        converted = np.ones(n_locations, dtype=bool)
+    else:
+        # Strings and other objects go through float() one at a time (numpy
+        # would accept None, as nan), stopping at the first it rejects;
+        # the ranges of the rows before that are still checked.
+        r_array, theta_array = np.zeros(n_locations), np.zeros(n_locations)
+        converted = np.zeros(n_locations, dtype=bool)
+        for i, (r_value, theta_value) in enumerate(zip(r, theta)):
+            try:
+                r_array[i], theta_array[i] = float(r_value), float(theta_value)
+                converted[i] = True
+            except ValueError:
+                problems.append((i, 2, TypeError("The 'r' and 'theta' values must be convertible to float.")))
+                break
+            except TypeError as error:
+                problems.append((i, 2, error))
+                break
+
+    negative = np.flatnonzero(converted & (r_array < 0))
+    if len(negative):
+        problems.append((int(negative[0]), 3, ValueError("The 'r' value (polar radius) must be non-negative.")))
+    out_of_range = np.flatnonzero(converted & ~((theta_array >= -np.pi) & (theta_array <= math.pi)))
+    if len(out_of_range):
+        problems.append(
+            (int(out_of_range[0]), 4, ValueError("The 'theta' value must be within the range -π ≤ θ ≤ π."))
+        )
+
+    if depot_array.dtype != bool:
+        # Checked as given, since numpy would turn [True, 1] into [1, 1]
+        values = depot if isinstance(depot, list) else depot_array.tolist()
+        row = next((i for i, value in enumerate(values) if not isinstance(value, bool)), None)
+        if row is None:
+            depot_array = depot_array.astype(bool)
+        else:
+            problems.append((row, 5, TypeError("The 'depot' value must be a boolean.")))
+
+    if problems:
+        raise min(problems, key=lambda problem: problem[:2])[2]
+
+    columns = []
+    for column, values, types in (("name", names, column_types[0]), ("region", regions, column_types[1])):
+        if types - {str}:
+            # str subclasses, such as numpy.str_, are stored as plain str
+            # as Location stores them.
+            values = list(map(str, values))
+        # Only the values the pattern cannot vouch for need formatting.
+        reformatted = {}
+        for value in dict.fromkeys(values):
+            if _FORMATTED_WORDS.fullmatch(value) is None:
+                formatted = _capitalize_words(value)
+                if formatted != value:
+                    warnings.warn(f"The '{column}' value '{value}' was reformatted to '{formatted}'.")
+                    reformatted[value] = formatted
+        if reformatted:
+            values = [reformatted.get(value, value) for value in values]
+        columns.append(values)
+
+    return columns[0], columns[1], r_array, theta_array, depot_array.reshape(-1)
+
+
+class _LocationBase:
+    """
+    What every Location does, whether it stores its fields (Location) or
+    reads them from a columnar Country (_LocationView). It has no slots
+    of its own, so each keeps only the ones it uses.
+    """
+
+    __slots__ = ()
+
     @property
     def depot(self):
         return self._depot
@@ -66,6 +1103,8 @@ class Location:
     def depot(self, value):
         if not isinstance(value, bool):
             raise TypeError("The 'depot' value must be a boolean.")
+        if value != self._depot:
+            Location._depot_epoch += 1
         self._depot = value
 
     @property
@@ -93,9 +1132,9 @@ class Location:
         return f"{self.name} [{type_str}] in {self.region} @ ({r_str} m, {theta_str} pi)"
 
     def distance_to(self, other):
-        return math.sqrt(
-            self.r**2 + other.r**2 - 2 * self.r * other.r * math.cos(self.theta - other.theta)
-        )
+        if instrumentation.enabled:
+            instrumentation.count("distance_to")
+        return _distance(self.r, self.theta, other.r, other.theta, math)
 
     def __eq__(self, other):
         return (self.name == other.name) and (self.region == other.region)
@@ -116,127 +1155,1601 @@ class Location:
         return (self.region, self.name) >= (other.region, other.name)
 
 
-class Country:
-    def __init__(self, list_of_locations: List[Location]):
-        self._all_locations = tuple(list_of_locations)
-    
-    @property
-    def settlements(self):
-        return tuple(location for location in self._all_locations if location.settlement)
-
-    @property
-    def n_settlements(self):
-        return len(self.settlements)
-
-    @property
-    def depots(self):
-        return tuple(location for location in self._all_locations if location.depot)
-
-    @property
-    def n_depots(self):
-        return len(self.depots)
-
+class Location(_LocationBase, metaclass=ABCMeta):
+    __slots__ = ("name", "region", "r", "theta", "_depot")
 
-    def travel_time(self, start_location, end_location):
+    # Bumped whenever any Location's depot flag changes, so that a Country
+    # knows its cached settlement/depot lists need refreshing.
+    _depot_epoch = 0
 
-        if start_location not in self._all_locations:
-            raise ValueError(f"Location {start_location} is not in the Country")
-        if end_location not in self._all_locations:
-            raise ValueError(f"Location {end_location} is not in the Country")
+    def __init__(self, name, region, r, theta, depot):
+        if not isinstance(name, str):
+            raise TypeError("The 'name' must be a string.")
+        if not isinstance(region, str):
+            raise TypeError("The 'region' must be a string.")
         
-        distance = start_location.distance_to(end_location)
-        different_regions = start_location.region != end_location.region
-        locations_in_dest_region = len([location for location in self._all_locations
-         if location.region == end_location.region])
+        formatted_name = _capitalize_words(name)
+        formatted_region = _capitalize_words(region)
         
-        return travel_time(distance, different_regions, locations_in_dest_region)
+        if name != formatted_name:
+            warnings.warn(f"The 'name' value '{name}' was reformatted to '{formatted_name}'.")
+        if region != formatted_region:
+            warnings.warn(f"The 'region' value '{region}' was reformatted to '{formatted_region}'.")
 
-    def fastest_trip_from(self, current_location, potential_locations=None):
-        if potential_locations is None:
-            potential_locations = list(self.settlements)
-
-        resolved_locations = []
-        for loc in potential_locations:
-            if isinstance(loc, int):
-                if 0 <= loc < len(self.settlements):
-                    resolved_locations.append(self.settlements[loc])
-                else:
-                    raise IndexError(f"Index {loc} is out of range for settlements.")
-            elif isinstance(loc, Location):
-                resolved_locations.append(loc)
-
-        if not resolved_locations:
-            return None, None
+        self.name = formatted_name
+        self.region = formatted_region
 
-        travel_times = []
-        for loc in resolved_locations:
-            time = self.travel_time(current_location, loc)
-            travel_times.append((loc, time))
+        try:
+            self.r = float(r)
+            self.theta = float(theta)
+        except ValueError:
+            raise TypeError("The 'r' and 'theta' values must be convertible to float.")
 
-        travel_times.sort(key=lambda x: (x[1], x[0].name, x[0].region))
+        if self.r < 0:
+            raise ValueError("The 'r' value (polar radius) must be non-negative.")
 
-        return travel_times[0]
-    
-    def nn_tour(self, starting_depot):
-        if starting_depot not in self.depots:
+        if not (-np.pi <= self.theta <= math.pi):
+            raise ValueError("The 'theta' value must be within the range -π ≤ θ ≤ π.")
+
+        if not isinstance(depot, bool):
+            raise TypeError("The 'depot' value must be a boolean.")
+        
+        self._depot = depot
+
+    @classmethod
+    def from_arrays(cls, names, regions, r, theta, depot) -> List[Location]:
+        """
+        Builds many Locations at once, equal field for field to
+        [Location(*row) for row in zip(names, regions, r, theta, depot)]
+        but without running every check once per Location: each distinct
+        name and region is validated and formatted once (so a reformatted
+        value is warned about once, however often it appears), and r,
+        theta and depot are checked as arrays.
+
+        Parameters
+        ----------
+        names, regions : sequence of str
+        r, theta : array_like of float
+        depot : array_like of bool
+            A list of bools, or a numpy bool array.
+
+        Returns
+        -------
+        list of Location
+
+        Raises
+        ------
+        TypeError, ValueError
+            As Location would for the first invalid row, before any
+            reformatting warnings are issued.
+        """
+        return cls._from_validated(*_validated_columns(names, regions, r, theta, depot))
+
+    @classmethod
+    def _from_validated(cls, names, regions, r, theta, depot):
+        new = object.__new__
+        locations = []
+        append = locations.append
+        # Allocating millions of objects would otherwise set off a cyclic
+        # garbage collection pass every few hundred, none of them useful.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for name, region, r_value, theta_value, depot_value in zip(
+                names, regions, r.tolist(), theta.tolist(), depot.tolist()
+            ):
+                location = new(cls)
+                location.name = name
+                location.region = region
+                location.r = r_value
+                location.theta = theta_value
+                location._depot = depot_value
+                append(location)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return locations
+
+
+class _LocationView(_LocationBase):
+    """
+    A Location that reads its fields from one row of a columnar Country
+    instead of storing them. Setting depot writes through to the
+    Country's depot mask.
+    """
+
+    __slots__ = ("_country", "_row")
+
+    @classmethod
+    def _of(cls, country, row):
+        view = object.__new__(cls)
+        view._country = country
+        view._row = row
+        return view
+
+    @property
+    def name(self):
+        return self._country._names[self._row]
+
+    @property
+    def region(self):
+        return self._country._region_names[self._country._region_codes[self._row]]
+
+    @property
+    def r(self):
+        return float(self._country._r[self._row])
+
+    @property
+    def theta(self):
+        return float(self._country._theta[self._row])
+
+    @property
+    def _depot(self):
+        return bool(self._country._depot_mask[self._row])
+
+    @_depot.setter
+    def _depot(self, value):
+        self._country._depot_mask[self._row] = value
+
+
+# Views are Locations to everything outside this module.
+Location.register(_LocationView)
+
+
+def _intern_regions(regions, n_locations):
+    # Regions are interned as small integer codes, numbered in sorted
+    # order of the region names (add_location numbers new regions after
+    # these).
+    region_names = sorted(set(regions))
+    code_of = {region: code for code, region in enumerate(region_names)}
+    region_codes = np.fromiter(map(code_of.__getitem__, regions), dtype=np.int32, count=n_locations)
+    return [str(region) for region in region_names], region_codes
+
+
+class _NamesTable:
+    """
+    Location names packed into one UTF-8 buffer plus an array of offsets,
+    rather than one str object per location.
+    """
+
+    def __init__(self, names):
+        names = names if isinstance(names, list) else list(names)
+        buffer = "".join(names).encode()
+        self._buffer = np.frombuffer(buffer, dtype=np.uint8)
+        # For ASCII names, byte lengths are just string lengths
+        if len(buffer) == sum(map(len, names)):
+            lengths = np.fromiter(map(len, names), dtype=np.int64, count=len(names))
+        else:
+            lengths = np.fromiter((len(name.encode()) for name in names), dtype=np.int64, count=len(names))
+        self._offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self._offsets[1:])
+
+    @classmethod
+    def _from_buffer(cls, buffer, offsets):
+        table = cls.__new__(cls)
+        table._buffer = buffer
+        table._offsets = offsets
+        return table
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return self._buffer[self._offsets[i]:self._offsets[i + 1]].tobytes().decode()
+
+    def __iter__(self):
+        buffer, offsets = self._buffer.tobytes(), self._offsets.tolist()
+        return (buffer[start:stop].decode() for start, stop in zip(offsets, offsets[1:]))
+
+
+def _instrumented_steps(country, name, steps):
+    # _instrumented for a generator: each step is recorded as it is
+    # taken, and the whole stream is reported as one call once it ends.
+    if country._instrumentation is None or instrumentation.active():
+        return (yield from steps)
+    call_stats = Instrumentation()
+    try:
+        while True:
+            with recording(call_stats):
+                step = next(steps, _STREAM_END)
+            if step is _STREAM_END:
+                return
+            yield step
+    finally:
+        steps.close()
+        country._instrumentation.merge(call_stats)
+        if country._instrumentation_callback is not None:
+            country._instrumentation_callback(name, call_stats.stats())
+
+
+_STREAM_END = object()
+
+
+def _instrumented(method):
+    # Records what a public Country method does into the Country's
+    # Instrumentation, once enable_instrumentation has been called. Calls
+    # made from inside an instrumented call are recorded as part of it.
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._instrumentation is None or instrumentation.active():
+            return method(self, *args, **kwargs)
+        call_stats = Instrumentation()
+        try:
+            with recording(call_stats):
+                return method(self, *args, **kwargs)
+        finally:
+            self._instrumentation.merge(call_stats)
+            if self._instrumentation_callback is not None:
+                self._instrumentation_callback(method.__name__, call_stats.stats())
+
+    return wrapper
+
+
+class Country:
+    def __init__(self, list_of_locations: List[Location]):
+        locations = tuple(list_of_locations)
+        n_locations = len(locations)
+        self._set_columns(
+            [location.name for location in locations],
+            [location.region for location in locations],
+            np.fromiter((location.r for location in locations), dtype=float, count=n_locations),
+            np.fromiter((location.theta for location in locations), dtype=float, count=n_locations),
+            np.fromiter((location.depot for location in locations), dtype=bool, count=n_locations),
+        )
+        self._location_tuple = locations
+        self._columnar = False
+
+    @classmethod
+    def from_columns(cls, names, regions, r, theta, depot) -> Country:
+        """
+        Country of the Locations Location.from_arrays builds from these
+        columns: the same Country as Country(Location.from_arrays(...)),
+        but without gathering the columns back out of the Locations.
+
+        See Location.from_arrays for the parameters and errors.
+        """
+        names, regions, r, theta, depot = _validated_columns(names, regions, r, theta, depot)
+        country = cls.__new__(cls)
+        country._set_columns(names, regions, r, theta, depot)
+        country._location_tuple = tuple(Location._from_validated(names, regions, r, theta, depot))
+        country._columnar = False
+        return country
+
+    @classmethod
+    def _from_columns(cls, names, regions, r, theta, depot):
+        """
+        Columnar Country over columns that have already been validated
+        and formatted the way Location.__init__ would. Names are packed
+        into a _NamesTable, and the Locations it hands out are
+        lightweight views onto its rows, created only when asked for.
+        """
+        region_names, region_codes = _intern_regions(regions, len(r))
+        return cls._from_coded_columns(
+            _NamesTable(names),
+            region_names,
+            region_codes,
+            np.asarray(r, dtype=float),
+            np.asarray(theta, dtype=float),
+            np.array(depot, dtype=bool),
+        )
+
+    @classmethod
+    def _from_coded_columns(cls, names, region_names, region_codes, r, theta, depot_mask, **derived):
+        """
+        Columnar Country straight from its internal columns, which are
+        used as given (so they can be memory-mapped). derived may supply
+        precomputed region_counts, depot_ids, settlement_ids and
+        tiebreak_rank.
+        """
+        country = cls.__new__(cls)
+        country._set_coded_columns(names, region_names, region_codes, r, theta, depot_mask, **derived)
+        country._location_tuple = None
+        country._columnar = True
+        return country
+
+    def _set_columns(self, names, regions, r, theta, depot_mask):
+        region_names, region_codes = _intern_regions(regions, len(r))
+        self._set_coded_columns(names, region_names, region_codes, r, theta, depot_mask)
+
+    def _set_coded_columns(
+        self,
+        names,
+        region_names,
+        region_codes,
+        r,
+        theta,
+        depot_mask,
+        region_counts=None,
+        depot_ids=None,
+        settlement_ids=None,
+        tiebreak_rank=None,
+    ):
+        self._names = names
+        self._r = r
+        self._theta = theta
+        self._instrumentation = None
+        self._instrumentation_callback = None
+
+        self._region_names = region_names
+        self._region_codes = region_codes
+        if region_counts is None:
+            region_counts = np.bincount(region_codes, minlength=len(region_names))
+        self._region_counts = region_counts
+        self._region_members_cache = None
+
+        self._index_cache = None
+        self._canonical_ids_cache = None
+        self._travel_time_matrix = None
+        self._travel_time_store = None
+        self._travel_time_store_options = None
+        self._travel_time_dtype = np.dtype(np.float64)
+        self._location_arrays_cache = None
+        self._tiebreak_rank_cache = tiebreak_rank
+
+        # Tours kept by depot_tour_times(incremental=True), keyed by depot
+        # id, and what has changed since they were last brought up to date.
+        self._tour_cache = None
+        self._tour_cache_mask = None
+        self._changed_regions = set()
+        self._new_settlement_ids = set()
+        self.fastest_trip_cache_clear()
+
+        self._depot_mask = depot_mask
+        self._depot_epoch = Location._depot_epoch
+        if depot_ids is None or settlement_ids is None:
+            self._update_depot_ids()
+        else:
+            self._depot_ids = depot_ids
+            self._settlement_ids = settlement_ids
+            self._depots = None
+            self._settlements = None
+
+    @property
+    def _all_locations(self):
+        if self._location_tuple is None:
+            self._location_tuple = tuple(_LocationView._of(self, i) for i in range(len(self._r)))
+        return self._location_tuple
+
+    def _location(self, location_id):
+        if self._location_tuple is not None:
+            return self._location_tuple[location_id]
+        return _LocationView._of(self, location_id)
+
+    @property
+    def _region_members(self):
+        # Region name -> ids of the locations in it
+        if self._region_members_cache is None:
+            instrumentation.count("sort")
+            members = np.split(
+                np.argsort(self._region_codes, kind="stable"), np.cumsum(self._region_counts)[:-1]
+            )
+            self._region_members_cache = dict(zip(self._region_names, members))
+        return self._region_members_cache
+
+    @property
+    def _index(self):
+        # Duplicate (name, region) pairs are equal Locations, so they all
+        # resolve to the first occurrence.
+        if self._index_cache is None:
+            with instrumentation.phase("index_build"):
+                self._index_cache = {}
+                regions = (self._region_names[code] for code in self._region_codes)
+                for location_id, key in enumerate(zip(self._names, regions)):
+                    self._index_cache.setdefault(key, location_id)
+        return self._index_cache
+
+    @property
+    def _canonical_ids(self):
+        # The id each location resolves to through _index
+        if self._canonical_ids_cache is None:
+            index = self._index
+            if len(index) == len(self._r):
+                self._canonical_ids_cache = np.arange(len(self._r))
+            else:
+                regions = (self._region_names[code] for code in self._region_codes)
+                self._canonical_ids_cache = np.fromiter(
+                    map(index.__getitem__, zip(self._names, regions)), dtype=np.intp, count=len(self._r)
+                )
+        return self._canonical_ids_cache
+
+    def _refresh_depots(self):
+        if self._depot_epoch == Location._depot_epoch:
+            return
+        # A columnar Country's views write straight to its depot mask.
+        if not self._columnar:
+            self._depot_mask = np.fromiter(
+                (location.depot for location in self._location_tuple), dtype=bool, count=len(self._r)
+            )
+        self._update_depot_ids()
+        self._depot_epoch = Location._depot_epoch
+
+    def _update_depot_ids(self):
+        self._depot_ids = np.flatnonzero(self._depot_mask)
+        self._settlement_ids = np.flatnonzero(~self._depot_mask)
+        self._depots = None
+        self._settlements = None
+
+    @property
+    def settlements(self):
+        self._refresh_depots()
+        if self._settlements is None:
+            self._settlements = tuple(self._location(i) for i in self._settlement_ids)
+        return self._settlements
+
+    @property
+    def n_settlements(self):
+        self._refresh_depots()
+        return len(self._settlement_ids)
+
+    @property
+    def depots(self):
+        self._refresh_depots()
+        if self._depots is None:
+            self._depots = tuple(self._location(i) for i in self._depot_ids)
+        return self._depots
+
+    @property
+    def n_depots(self):
+        self._refresh_depots()
+        return len(self._depot_ids)
+
+    @property
+    def travel_time_matrix(self):
+        """
+        N x N array of travel times (in hours) between every pair of
+        locations, built on first access. Entry [i, j] is the time to
+        travel from self._all_locations[i] to self._all_locations[j].
+        """
+        if self._travel_time_matrix is None:
+            with instrumentation.phase("matrix_build"):
+                self._travel_time_matrix = self._build_travel_time_matrix()
+        return self._travel_time_matrix
+
+    def _build_travel_time_matrix(self):
+        if self._travel_time_dtype == np.float64:
+            return self._travel_time_block(slice(None), slice(None))
+        # Row blocks at a time, so the float64 times never all exist at once.
+        n_locations = len(self._r)
+        matrix = np.empty((n_locations, n_locations), dtype=self._travel_time_dtype)
+        chunk = max(1, _BATCH_CHUNK * 16 // max(n_locations, 1))
+        for first in range(0, n_locations, chunk):
+            matrix[first:first + chunk] = self._travel_time_block(slice(first, first + chunk), slice(None))
+        return matrix
+
+    def _travel_time_block(self, start_ids, end_ids):
+        r, theta, region_codes = self._r, self._theta, self._region_codes
+
+        # The same kernel as Location.distance_to, so every entry is
+        # bit-for-bit what the scalar path would have produced, and a block
+        # matches the same entries of the full matrix.
+        distance = _distance(
+            r[start_ids, np.newaxis], theta[start_ids, np.newaxis], r[np.newaxis, end_ids], theta[np.newaxis, end_ids]
+        )
+        different_regions = region_codes[start_ids, np.newaxis] != region_codes[np.newaxis, end_ids]
+        locations_in_dest_region = self._region_counts[region_codes[end_ids]][np.newaxis, :]
+
+        return travel_time(distance, different_regions, locations_in_dest_region)
+
+    def _location_id(self, location):
+        if isinstance(location, _LocationView) and location._country is self:
+            return location._row
+        if instrumentation.enabled:
+            instrumentation.count("membership_check")
+        location_id = self._index.get((location.name, location.region))
+        if location_id is None:
+            raise ValueError(f"Location {location} is not in the Country")
+        return location_id
+
+    def __contains__(self, location):
+        if instrumentation.enabled:
+            instrumentation.count("membership_check")
+        return (location.name, location.region) in self._index
+
+    @_instrumented
+    def add_location(self, location: Location) -> None:
+        """
+        Adds a Location to the Country, after all the existing ones.
+
+        Cached travel times are updated rather than discarded: a built
+        travel-time matrix gains a row and a column for the new location,
+        and only the columns into its region, whose population penalty
+        grows, are recomputed. Tours kept by
+        depot_tour_times(incremental=True) are re-checked on the next call.
+
+        Raises
+        ------
+        ValueError
+            If an equal Location is already in the Country.
+        """
+        self._refresh_depots()
+        self._check_editable()
+        if not isinstance(location, Location):
+            raise TypeError("Only Location instances can be added to a Country.")
+        if location in self:
+            raise ValueError(f"Location {location} is already in the Country")
+
+        location_id = len(self._r)
+        if location.region in self._region_names:
+            code = self._region_names.index(location.region)
+        else:
+            code = len(self._region_names)
+            self._region_names.append(location.region)
+            self._region_counts = np.append(self._region_counts, 0)
+
+        self._names.append(location.name)
+        self._r = np.append(self._r, location.r)
+        self._theta = np.append(self._theta, location.theta)
+        self._region_codes = np.append(self._region_codes, np.int32(code))
+        self._depot_mask = np.append(self._depot_mask, location.depot)
+        self._region_counts = self._region_counts.copy()
+        self._region_counts[code] += 1
+        self._location_tuple = self._location_tuple + (location,)
+        if self._index_cache is not None:
+            self._index_cache[(location.name, location.region)] = location_id
+        self._canonical_ids_cache = None
+
+        if self._travel_time_matrix is not None:
+            matrix = np.empty((location_id + 1, location_id + 1), dtype=self._travel_time_matrix.dtype)
+            matrix[:-1, :-1] = self._travel_time_matrix
+            matrix[-1:, :] = self._travel_time_block([location_id], slice(None))
+            self._travel_time_matrix = matrix
+        self._after_edit(code)
+
+        if self._tour_cache is not None:
+            self._tour_cache_mask = np.append(self._tour_cache_mask, location.depot)
+            if not location.depot:
+                self._new_settlement_ids.add(location_id)
+
+    @_instrumented
+    def remove_location(self, location: Location) -> None:
+        """
+        Removes a Location from the Country.
+
+        As with add_location, a built travel-time matrix loses just that
+        location's row and column, and only the columns into its region
+        are recomputed.
+
+        Raises
+        ------
+        ValueError
+            If the Location is not in the Country.
+        """
+        self._refresh_depots()
+        self._check_editable()
+        location_id = self._location_id(location)
+        code = int(self._region_codes[location_id])
+
+        del self._names[location_id]
+        self._r = np.delete(self._r, location_id)
+        self._theta = np.delete(self._theta, location_id)
+        self._region_codes = np.delete(self._region_codes, location_id)
+        self._depot_mask = np.delete(self._depot_mask, location_id)
+        self._region_counts = self._region_counts.copy()
+        self._region_counts[code] -= 1
+        self._location_tuple = self._location_tuple[:location_id] + self._location_tuple[location_id + 1:]
+        self._index_cache = None
+        self._canonical_ids_cache = None
+
+        if self._travel_time_matrix is not None:
+            matrix = np.delete(self._travel_time_matrix, location_id, axis=0)
+            self._travel_time_matrix = np.delete(matrix, location_id, axis=1)
+        self._after_edit(code)
+
+        if self._tour_cache is not None:
+            # A removed depot's tour goes; every other tour is only still
+            # right up to the step that visited the removed settlement.
+            self._tour_cache.pop(location_id, None)
+            renumbered = {}
+            for depot_id, order in self._tour_cache.items():
+                order = order[:np.flatnonzero(np.append(order == location_id, True))[0]]
+                order[order > location_id] -= 1
+                renumbered[depot_id - (depot_id > location_id)] = order
+            self._tour_cache = renumbered
+            self._tour_cache_mask = np.delete(self._tour_cache_mask, location_id)
+            self._new_settlement_ids = {
+                i - (i > location_id) for i in self._new_settlement_ids if i != location_id
+            }
+
+    def _check_editable(self):
+        if self._columnar:
+            raise TypeError(
+                "Locations cannot be added to or removed from a columnar Country, "
+                "since its Location views refer to rows by position."
+            )
+
+    def _after_edit(self, changed_region):
+        # Trips into changed_region changed with its population; everything
+        # derived from the columns is rebuilt lazily.
+        if self._travel_time_matrix is not None:
+            members = np.flatnonzero(self._region_codes == changed_region)
+            self._travel_time_matrix[:, members] = self._travel_time_block(slice(None), members)
+        if self._tour_cache is not None:
+            self._changed_regions.add(changed_region)
+        self._close_travel_time_store()
+        self._region_members_cache = None
+        self._location_arrays_cache = None
+        self._tiebreak_rank_cache = None
+        self._update_depot_ids()
+        self.fastest_trip_cache_clear()
+
+    @_instrumented
+    def travel_time(self, start_location, end_location):
+        start_id = self._location_id(start_location)
+        end_id = self._location_id(end_location)
+        return float(self._travel_times(start_id, end_id))
+
+    def location_ids(self, locations) -> np.ndarray:
+        """
+        Ids of the given Locations, for use with travel_times. A
+        location's id is its position in the Country.
+        """
+        return np.fromiter(map(self._location_id, locations), dtype=np.intp)
+
+    @_instrumented
+    def travel_times(self, start_ids, end_ids, dtype=np.float64, out=None) -> np.ndarray:
+        """
+        Travel times for whole arrays of trips in one vectorized pass.
+
+        Parameters
+        ----------
+        start_ids, end_ids : array_like of int
+            Ids (see location_ids) of the start and end of each trip.
+            They broadcast against each other, so one start and many ends
+            gives a row, and start_ids[:, None] with end_ids a block.
+        dtype : {numpy.float64, numpy.float32}, default: numpy.float64
+            Type of the returned array. float64 results are exactly those
+            of travel_time; float32 ones are those, rounded.
+        out : ndarray, optional
+            Array to write the results to, of the broadcast shape; its
+            dtype overrides dtype.
+
+        Returns
+        -------
+        ndarray
+            Travel times in hours.
+        """
+        start_ids, end_ids = np.asarray(start_ids), np.asarray(end_ids)
+        for ids in (start_ids, end_ids):
+            if ids.dtype.kind not in "iu":
+                raise TypeError("Location ids must be integers; see Country.location_ids.")
+            if ids.size and (ids.min() < 0 or ids.max() >= len(self._r)):
+                raise IndexError(f"Location ids must be in range({len(self._r)}).")
+
+        arrays, matrix = self._location_arrays, self._affordable_matrix()
+        if matrix is not None and matrix.dtype == np.float32 and (out is None and np.dtype(dtype) == np.float32):
+            # The stored times are exactly the float64 ones, rounded.
+            return np.asarray(matrix[start_ids, end_ids], dtype=np.float32)
+        return _batched(
+            lambda start, end: _times_between(arrays, matrix, start, end),
+            [start_ids, end_ids],
+            [np.intp, np.intp],
+            dtype,
+            out,
+        )
+
+    def _travel_times(self, start_id, end_ids):
+        matrix = _scannable(_exact(self._affordable_matrix()), np.size(end_ids))
+        if matrix is not None:
+            return matrix[start_id, end_ids]
+        return _travel_times_from(
+            self._r[start_id],
+            self._theta[start_id],
+            self._region_codes[start_id],
+            self._r[end_ids],
+            self._theta[end_ids],
+            self._region_codes[end_ids],
+            self._region_counts[self._region_codes[end_ids]],
+        )
+
+    def _affordable_matrix(self):
+        # The dense matrix if it fits, otherwise the tiled store if one is
+        # enabled, otherwise None (times are computed as needed).
+        if self._travel_time_matrix is None and len(self._r) > _MATRIX_MAX_LOCATIONS:
+            return self._tiled_travel_times()
+        return self.travel_time_matrix
+
+    def enable_travel_time_store(
+        self, memory_limit=256 * 2**20, tile_size=512, scratch_dir=None, disk_limit=4 * 2**30
+    ) -> None:
+        """
+        For a Country too large for travel_time_matrix, keeps travel times
+        in a TiledTravelTimes instead of recomputing them whenever they
+        are needed: square tiles of the matrix are computed on first use,
+        the most recent are kept in memory, and the rest spill to a
+        memory-mapped scratch file. Smaller Countries keep using the dense
+        matrix. Results are exactly the same either way.
+
+        Tiles group locations that are close together and in the same
+        region, so the trips between nearby locations that tours, tour
+        improvement and small queries need come from a few tiles. Unless
+        memory_limit holds the whole matrix, tours and fastest_trip_from
+        read only the times of the few candidates a spatial index finds
+        around each stop, not whole rows, since those would compute most
+        of the tiles. The store is discarded when locations are added or
+        removed, and rebuilt on demand.
+
+        Parameters
+        ----------
+        memory_limit : int, default: 256 MiB
+            Bytes of tiles kept in memory.
+        tile_size : int, default: 512
+            Locations along each side of a tile.
+        scratch_dir : str or Path, optional
+            Directory for the scratch file; by default the system's
+            temporary directory.
+        disk_limit : int, default: 4 GiB
+            Bytes the scratch file may grow to. Once it is full, evicted
+            tiles are dropped and recomputed if needed again.
+        """
+        self._close_travel_time_store()
+        self._travel_time_store_options = dict(
+            memory_limit=memory_limit, tile_size=tile_size, scratch_dir=scratch_dir, disk_limit=disk_limit
+        )
+
+    def set_travel_time_precision(self, dtype=np.float64) -> None:
+        """
+        Chooses the type travel_time_matrix and the tiled store (see
+        enable_travel_time_store) keep travel times in.
+
+        float32 halves their memory and the bandwidth of scanning them. It
+        only decides which candidates are worth a closer look: rounding to
+        float32 keeps the order of the times, so the exact fastest trips
+        are always among those tied for the fastest once rounded, and
+        those few are re-checked in float64. Every time the Country
+        returns, and every tour and tie-break, is exactly as in float64
+        (travel_times(dtype=numpy.float32) can then read the stored times
+        directly).
+
+        Parameters
+        ----------
+        dtype : {numpy.float64, numpy.float32}, default: numpy.float64
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in (np.float64, np.float32):
+            raise ValueError(f"Travel times can be kept as float64 or float32, not {dtype}.")
+        if dtype != self._travel_time_dtype:
+            self._travel_time_dtype = dtype
+            self._travel_time_matrix = None
+            self._close_travel_time_store()
+
+    def disable_travel_time_store(self) -> None:
+        """Discards the tiled store, deleting its scratch file."""
+        self._close_travel_time_store()
+        self._travel_time_store_options = None
+
+    def travel_time_store_info(self) -> Optional[TileCacheInfo]:
+        """
+        Statistics of the tiled store (see TiledTravelTimes.cache_info), or
+        None if it has not been built.
+        """
+        if self._travel_time_store is None:
+            return None
+        return self._travel_time_store.cache_info()
+
+    def _tiled_travel_times(self):
+        if self._travel_time_store is None and self._travel_time_store_options is not None:
+            arrays = self._location_arrays
+            self._travel_time_store = TiledTravelTimes(
+                len(self._r),
+                self._travel_time_tile,
+                dtype=self._travel_time_dtype,
+                # Tours mostly stay within a region, so tiles follow regions.
+                order=_spatial_order(
+                    arrays.x, arrays.y, self._travel_time_store_options["tile_size"], arrays.region_codes
+                ),
+                **self._travel_time_store_options,
+            )
+        return self._travel_time_store
+
+    def _travel_time_tile(self, start_ids, end_ids):
+        with instrumentation.phase("matrix_build"):
+            return self._travel_time_block(start_ids, end_ids)
+
+    def _close_travel_time_store(self):
+        if self._travel_time_store is not None:
+            self._travel_time_store.close()
+            self._travel_time_store = None
+
+    @_instrumented
+    def fastest_trip_from(self, current_location, potential_locations=None):
+        # Settlements are looked up by id, so a lazy Country only builds
+        # views of the ones it returns.
+        self._refresh_depots()
+        settlement_ids = self._settlement_ids
+        n_settlements = len(settlement_ids)
+
+        def settlement(k):
+            if self._settlements is not None:
+                return self._settlements[k]
+            return self._location(int(settlement_ids[k]))
+
+        if potential_locations is None:
+            candidate_ids = self._canonical_ids[settlement_ids]
+            candidate = settlement
+        elif isinstance(potential_locations, np.ndarray) and potential_locations.dtype.kind in "iu":
+            # Fast path for arrays of settlement indices
+            indices = potential_locations.ravel()
+            out_of_range = (indices < 0) | (indices >= n_settlements)
+            if out_of_range.any():
+                raise IndexError(f"Index {indices[out_of_range][0]} is out of range for settlements.")
+            candidate_ids = self._canonical_ids[settlement_ids[indices]]
+            candidate = lambda k: settlement(int(indices[k]))
+        else:
+            resolved_locations = []
+            for loc in potential_locations:
+                if isinstance(loc, int):
+                    if 0 <= loc < n_settlements:
+                        resolved_locations.append(settlement(loc))
+                    else:
+                        raise IndexError(f"Index {loc} is out of range for settlements.")
+                elif isinstance(loc, Location):
+                    resolved_locations.append(loc)
+            candidate_ids = np.fromiter(
+                map(self._location_id, resolved_locations), dtype=np.intp, count=len(resolved_locations)
+            )
+            candidate = resolved_locations.__getitem__
+
+        if not len(candidate_ids):
+            return None, None
+
+        current_id = self._location_id(current_location)
+        best_id, best_time = self._fastest_trip_ids(current_id, candidate_ids)
+        return candidate(int(np.argmax(candidate_ids == best_id))), best_time
+
+    def _fastest_trip_ids(self, current_id, candidate_ids):
+        # Memoized on the origin and a fingerprint of the sorted candidate
+        # ids, so each entry takes the same few bytes however many
+        # candidates there are, and the same candidates in any order share
+        # it. Equal Locations share an id, so the result does not depend
+        # on which of them was passed.
+        fingerprint = hashlib.blake2b(np.sort(np.asarray(candidate_ids, dtype=np.intp)), digest_size=16)
+        key = (current_id, len(candidate_ids), fingerprint.digest())
+        cache = self._trip_cache
+        if key in cache:
+            cache.move_to_end(key)
+            self._trip_cache_hits += 1
+            return cache[key]
+        self._trip_cache_misses += 1
+
+        sorted_ids = self._sorted_neighbours(current_id)
+        if sorted_ids is not None:
+            best_id = _first_member(sorted_ids, candidate_ids, len(self._r))
+        else:
+            # Ties on time are broken by name, then region
+            arrays, matrix = self._location_arrays, self._affordable_matrix()
+            if _scannable(matrix, len(candidate_ids)) is not None:
+                fastest, _ = _shortlist_fastest_of(arrays, matrix, current_id, candidate_ids)
+            else:
+                fastest, _ = _screened_fastest_of(arrays, current_id, candidate_ids, matrix)
+            best_id = int(fastest[np.argmin(self._tiebreak_rank[fastest])])
+        result = best_id, float(self._travel_times(current_id, best_id))
+
+        if _TRIP_CACHE_SIZE > 0:
+            cache[key] = result
+            if len(cache) > _TRIP_CACHE_SIZE:
+                cache.popitem(last=False)
+        return result
+
+    def _sorted_neighbours(self, origin_id):
+        # Every location id in (travel time, name, region) order from
+        # origin_id, built once the origin has missed the cache twice and
+        # kept for the most recent origins within _SORTED_NEIGHBOURS_BUDGET.
+        # Misses are counted for the _TRIP_CACHE_SIZE most recent origins.
+        neighbours = self._sorted_neighbour_cache
+        if origin_id in neighbours:
+            neighbours.move_to_end(origin_id)
+            return neighbours[origin_id]
+        misses = self._sorted_neighbour_misses
+        misses[origin_id] = misses.get(origin_id, 0) + 1
+        misses.move_to_end(origin_id)
+        while len(misses) > max(_TRIP_CACHE_SIZE, 1):
+            misses.popitem(last=False)
+        n_locations = len(self._r)
+        max_origins = _SORTED_NEIGHBOURS_BUDGET // max(n_locations, 1)
+        if misses[origin_id] < 2 or max_origins < 1:
+            return None
+
+        times = self._travel_times(origin_id, np.arange(n_locations))
+        neighbours[origin_id] = np.lexsort((self._tiebreak_rank, times))
+        instrumentation.count("sort")
+        while len(neighbours) > max_origins:
+            neighbours.popitem(last=False)
+        return neighbours[origin_id]
+
+    def fastest_trip_cache_info(self) -> TripCacheInfo:
+        """
+        Statistics of the cache behind fastest_trip_from, in the style of
+        functools.lru_cache's cache_info().
+        """
+        return TripCacheInfo(
+            self._trip_cache_hits, self._trip_cache_misses, _TRIP_CACHE_SIZE, len(self._trip_cache),
+            len(self._sorted_neighbour_cache),
+        )
+
+    def fastest_trip_cache_clear(self) -> None:
+        """
+        Empties the fastest_trip_from cache and resets its statistics.
+        Adding or removing locations does this automatically; call it
+        after changing a Location's position or region in place.
+        """
+        self._trip_cache = OrderedDict()
+        self._trip_cache_hits = 0
+        self._trip_cache_misses = 0
+        self._sorted_neighbour_cache = OrderedDict()
+        self._sorted_neighbour_misses = OrderedDict()
+
+    def enable_instrumentation(self, callback=None) -> None:
+        """
+        Starts counting what the Country's public methods do: travel times
+        computed, distances computed, membership checks and sorts, and the
+        time spent building indices and the travel-time matrix,
+        constructing tours, improving them and searching for exact ones
+        (see instrumentation.Instrumentation). Any previous counts are
+        discarded.
+
+        Work done in worker processes (workers=...) is not counted, though
+        the phases that contain it are still timed.
+
+        Parameters
+        ----------
+        callback : callable, optional
+            Called after each public method call as
+            callback(method_name, stats), with stats (a dict, as returned
+            by instrumentation_stats) covering just that call.
+        """
+        self._instrumentation = Instrumentation()
+        self._instrumentation_callback = callback
+
+    def disable_instrumentation(self) -> None:
+        """Stops counting, so the hot paths run at full speed again."""
+        self._instrumentation = None
+        self._instrumentation_callback = None
+
+    def instrumentation_stats(self) -> Optional[dict]:
+        """
+        Counts and phase times of every public method call since
+        enable_instrumentation, as
+        {"counters": {name: n}, "phases": {name: {"seconds": s, "calls": n}}},
+        or None if instrumentation is not enabled.
+        """
+        if self._instrumentation is None:
+            return None
+        return self._instrumentation.stats()
+
+    @_instrumented
+    def nn_tour(self, starting_depot, tie_break="name", accumulate="sequential"):
+        """
+        Nearest-neighbour tour from starting_depot through every
+        settlement and back.
+
+        Parameters
+        ----------
+        starting_depot : Location
+        tie_break : {"name", "position"}, default: "name"
+            Equally fast trips go to the settlement first by (name,
+            region), or first in the Country.
+        accumulate : {"sequential", "compensated"}, default: "sequential"
+            Whether the total is the leg times added up in order, or with
+            compensated summation (which can differ in the last bits).
+
+        Returns
+        -------
+        tour : list of Location
+        total_time : float
+        """
+        self._check_depot(starting_depot)
+        return self._nn_tour(starting_depot, tie_break, accumulate)
+
+    def iter_nn_tour(self, starting_depot, tie_break="name", accumulate="sequential"):
+        """
+        nn_tour, one leg at a time, so the start of a long tour can be
+        used while the rest is still being decided.
+
+        The Country must not be edited while the tour is being streamed.
+
+        Yields
+        ------
+        location : Location
+            starting_depot (with zero times), then each settlement as it
+            is chosen, then starting_depot again for the return leg:
+            the locations of nn_tour's tour, in order.
+        leg_time : float
+            Time of the leg into location.
+        cumulative_time : float
+            Time of the tour so far; the last is nn_tour's total time.
+        """
+        self._check_depot(starting_depot)
+        return _instrumented_steps(self, "iter_nn_tour", self._nn_tour_steps(starting_depot, tie_break, accumulate))
+
+    def _check_depot(self, starting_depot):
+        self._refresh_depots()
+        if starting_depot not in self or not self._depot_mask[self._location_id(starting_depot)]:
             raise ValueError(f"Starting location {starting_depot} is not a depot in the Country")
 
-        tour = [starting_depot]
-        unvisited = list(self.settlements)
-        current_location = starting_depot
-        total_time = 0
+    def _nn_tour(self, start, tie_break, accumulate):
+        # nn_tour and nearest_neighbour_path, which differ only in
+        # nearest_neighbour_path not checking that start is a depot.
+        tie_rank, tour_sum = _tour_policies(self._location_arrays, tie_break, accumulate)
+        order, total_time = _nn_tour_ids(
+            self._location_id(start), self._tour_scanner(), self._location_arrays, tie_rank=tie_rank, tour_sum=tour_sum
+        )
+        return [start, *(self._location(i) for i in order), start], total_time
 
-        while unvisited:
-            next_location, travel_time = self.fastest_trip_from(current_location, unvisited)
-            tour.append(next_location)
-            total_time += travel_time
-            unvisited.remove(next_location)
-            current_location = next_location
+    def _nn_tour_steps(self, start, tie_break, accumulate):
+        tie_rank, tour_sum = _tour_policies(self._location_arrays, tie_break, accumulate)
+        start_id = self._location_id(start)
+        yield start, 0.0, 0.0
+        total = tour_sum()
+        scanner = self._tour_scanner()
+        n_settlements = len(scanner)
+        legs = _nn_tour_legs(start_id, scanner, self._location_arrays, tie_rank=tie_rank)
+        for step, (location_id, leg_time) in enumerate(legs):
+            # The last leg is the return to start.
+            location = start if step == n_settlements else self._location(location_id)
+            yield location, leg_time, total.add(leg_time)
 
-        return_time = self.travel_time(current_location, starting_depot)
-        tour.append(starting_depot)
-        total_time += return_time
+    @_instrumented
+    def improve_tour(self, tour, time_budget=None, n_neighbours=8):
+        """
+        Shortens a closed tour, such as one returned by nn_tour, with
+        2-opt and Or-opt local search (see tour_improvement).
 
-        return tour, total_time
-    
-    def nearest_neighbour_path(self, start_depot):
-        path = [start_depot]
-        unvisited = list(self.settlements)
-        current_location = start_depot
+        Parameters
+        ----------
+        tour : list of Location
+            A tour that starts and ends at the same depot and visits every
+            other stop once.
+        time_budget : float, optional
+            Seconds to spend searching. By default the search runs until
+            no candidate move improves the tour.
+        n_neighbours : int, default: 8
+            How many of the fastest destinations from each stop are
+            considered as new legs.
 
-        while unvisited:
-            nearest = min(unvisited, key=lambda loc: self.travel_time(current_location, loc))
-            path.append(nearest)
-            unvisited.remove(nearest)
-            current_location = nearest
+        Returns
+        -------
+        tour : list of Location
+            The improved tour, starting and ending at the same depot.
+        total_time : float
+            The time it takes to complete.
+        """
+        stops = tour[:-1]
+        tour_ids = [self._location_id(location) for location in stops]
+        by_id = dict(zip(tour_ids, stops))
+        improved, total_time = _improve_tour_ids(
+            tour_ids, self._location_arrays, self._affordable_matrix(), time_budget, n_neighbours
+        )
+        return [by_id[location_id] for location_id in improved] + [tour[0]], total_time
 
-        path.append(start_depot)
-        return path
+    @_instrumented
+    def optimal_tour(self, starting_depot, memory_limit=None, time_budget=None):
+        """
+        The shortest tour from starting_depot through every settlement,
+        for Countries small enough to solve exactly (about 20 settlements).
 
-    def best_depot_site(self, display=True):
-        if not self.depots:
+        Uses Held-Karp dynamic programming (see exact_tour) when it
+        fits in memory_limit (it takes held_karp_memory(n_settlements)
+        bytes), and otherwise branch and bound, starting from the
+        nearest-neighbour tour as the best known.
+
+        Parameters
+        ----------
+        starting_depot : Location
+        memory_limit : int, optional
+            Bytes Held-Karp may use; 256 MiB by default, enough for 20
+            settlements.
+        time_budget : float, optional
+            Seconds branch and bound may take. If it runs out, the best
+            tour found so far is returned, with a warning. Without one,
+            branch and bound is only run on up to 30 settlements, since
+            its time grows exponentially.
+
+        Returns
+        -------
+        tour : list of Location
+        total_time : float
+        """
+        self._refresh_depots()
+        if starting_depot not in self or not self._depot_mask[self._location_id(starting_depot)]:
+            raise ValueError(f"Starting location {starting_depot} is not a depot in the Country")
+
+        order, total_time = _optimal_tour_ids(
+            self._location_id(starting_depot),
+            self._settlement_ids,
+            self._location_arrays,
+            self._affordable_matrix(),
+            memory_limit,
+            time_budget,
+        )
+        return [starting_depot, *(self._location(i) for i in order), starting_depot], total_time
+
+    def _tour_scanner(self):
+        return _tour_scanner(self._settlement_ids, self._location_arrays, self._affordable_matrix())
+
+    @property
+    def _location_arrays(self):
+        if self._location_arrays_cache is None:
+            xy = polar_to_xy(np.column_stack((self._theta, self._r)))
+            self._location_arrays_cache = _LocationArrays(
+                r=self._r,
+                theta=self._theta,
+                x=xy[:, 0],
+                y=xy[:, 1],
+                region_codes=self._region_codes,
+                region_counts=self._region_counts,
+                tiebreak_rank=self._tiebreak_rank,
+                penalty=(1 + self._region_counts[self._region_codes] / 10) ** 2,
+            )
+        return self._location_arrays_cache
+
+    @property
+    def _tiebreak_rank(self):
+        # Position of each location in (name, region) order, used to
+        # break ties between equally fast trips.
+        if self._tiebreak_rank_cache is None:
+            with instrumentation.phase("index_build"):
+                names = np.array(list(self._names), dtype=str)
+                regions = np.array(self._region_names, dtype=str)[self._region_codes]
+                tiebreak_rank = np.empty(len(names), dtype=np.intp)
+                tiebreak_rank[np.lexsort((regions, names))] = np.arange(len(names))
+                instrumentation.count("sort")
+            self._tiebreak_rank_cache = tiebreak_rank
+        return self._tiebreak_rank_cache
+
+    @_instrumented
+    def nearest_neighbour_path(self, start_depot, tie_break="name"):
+        """
+        The locations of the nearest-neighbour tour from start_depot,
+        which need not be a depot: the same tour as nn_tour's, from the
+        same kernel.
+        """
+        return self._nn_tour(start_depot, tie_break, "sequential")[0]
+
+    def iter_nearest_neighbour_path(self, start_depot, tie_break="name", accumulate="sequential"):
+        """
+        nearest_neighbour_path, one leg at a time, as iter_nn_tour.
+        """
+        return _instrumented_steps(
+            self, "iter_nearest_neighbour_path", self._nn_tour_steps(start_depot, tie_break, accumulate)
+        )
+
+    @_instrumented
+    def depot_tour_times(
+        self, workers=None, improve=False, time_budget=None, incremental=False, exact=False, memory_limit=None
+    ):
+        """
+        Time taken by the nearest-neighbour tour from every depot.
+
+        Parameters
+        ----------
+        workers : int, optional
+            If given, the tours are run across a pool of this many
+            processes, which read the location arrays from shared memory
+            rather than receiving a pickled copy of the Country.
+        improve : bool, default: False
+            If True, each tour is shortened with improve_tour before it
+            is timed.
+        time_budget : float, optional
+            Seconds improve_tour may spend on each tour.
+        incremental : bool, default: False
+            If True, every depot's tour is kept, and later incremental
+            calls only re-run each tour from the first step that the edits
+            made since (add_location, remove_location and depot flag
+            changes) could have changed. The times are exactly those of a
+            full recomputation.
+        exact : bool, default: False
+            If True, time each depot's optimal tour (see optimal_tour)
+            instead of its nearest-neighbour tour. time_budget then limits
+            each branch-and-bound search, and is required beyond 30
+            settlements if Held-Karp does not fit in memory_limit.
+        memory_limit : int, optional
+            Bytes each exact tour's Held-Karp search may use.
+
+        Returns
+        -------
+        dict
+            Maps each depot, in the order of self.depots, to its tour time.
+        """
+        depots = self.depots
+        if exact and improve:
+            raise ValueError("Exact tours cannot be improved further.")
+        if incremental:
+            if workers is not None or improve or exact:
+                raise ValueError("Incremental tour times cannot be combined with workers, improve or exact.")
+            return dict(zip(depots, self._incremental_tour_times()))
+
+        options = dict(improve=improve, time_budget=time_budget, exact=exact, memory_limit=memory_limit)
+        if workers is None:
+            arrays, matrix = self._location_arrays, self._affordable_matrix()
+            return {
+                depot: _depot_tour_time(self._location_id(depot), self._settlement_ids, arrays, matrix, **options)
+                for depot in depots
+            }
+
+        start_ids = [self._location_id(depot) for depot in depots]
+        worker = partial(_tour_time_worker, **options)
+        tour_times = self._map_over_tour_pool(worker, start_ids, workers)
+
+        return dict(zip(depots, tour_times))
+
+    def _map_over_tour_pool(self, function, tasks, workers):
+        # Runs function over tasks in a pool of worker processes, which
+        # read the location arrays (and dense matrix, if affordable) from shared
+        # memory rather than receiving a pickled copy of the Country.
+        arrays = self._location_arrays._asdict()
+        arrays["settlement_ids"] = self._settlement_ids
+        matrix = self._affordable_matrix()
+        if isinstance(matrix, np.ndarray):
+            arrays["matrix"] = matrix
+
+        shm, layout = _share_arrays(arrays)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_tour_worker, initargs=(shm.name, layout)
+            ) as pool:
+                return list(pool.map(function, tasks))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    @_instrumented
+    def multi_depot_tours(self, k, workers=None, max_iterations=100):
+        """
+        Splits the settlements between k depots and builds a
+        nearest-neighbour tour from each, so that several depots can
+        serve the Country at once.
+
+        The k depots are chosen from self.depots by k-medoids (see
+        clustering.k_medoids), where the cost of serving a settlement from
+        a depot is the round-trip travel time between them; as travel
+        times include the region penalty, settlements tend to be served
+        from a depot in their own region. Each settlement is assigned to
+        the chosen depot it is quickest to reach and return from.
+
+        Parameters
+        ----------
+        k : int
+            Number of depots to use, between 1 and n_depots.
+        workers : int, optional
+            If given, the tours are built across a pool of this many
+            processes, as in depot_tour_times.
+        max_iterations : int, default: 100
+            Maximum number of k-medoids swaps.
+
+        Returns
+        -------
+        tours : dict
+            Maps each chosen depot, in the order of self.depots, to its
+            (tour, total_time), as returned by nn_tour but visiting only
+            the settlements assigned to that depot.
+        makespan : float
+            The longest of the tour times, i.e. how long until every
+            settlement has been visited when all the tours run at once.
+        """
+        depots = self.depots
+        if not depots:
             raise ValueError("No depots available in the country.")
+        if not 1 <= k <= len(depots):
+            raise ValueError(f"k must be between 1 and the number of depots ({len(depots)}), not {k}.")
+
+        depot_ids, settlement_ids = self._depot_ids, self._settlement_ids
+        costs = self.travel_times(depot_ids[:, np.newaxis], settlement_ids)
+        costs += self.travel_times(settlement_ids, depot_ids[:, np.newaxis])
+        medoids, assignment = k_medoids(costs, k, max_iterations=max_iterations)
+
+        tasks = [(int(depot_ids[m]), settlement_ids[assignment == i]) for i, m in enumerate(medoids)]
+        if workers is None:
+            arrays, matrix = self._location_arrays, self._affordable_matrix()
+            results = [
+                _nn_tour_ids(start_id, _tour_scanner(ids, arrays, matrix), arrays) for start_id, ids in tasks
+            ]
+        else:
+            results = self._map_over_tour_pool(_cluster_tour_worker, tasks, workers)
+
+        tours = {}
+        for m, (order, total_time) in zip(medoids, results):
+            depot = depots[m]
+            tours[depot] = [depot, *(self._location(i) for i in order), depot], total_time
+        return tours, max(total_time for _, total_time in tours.values())
+
+    @_instrumented
+    def hierarchical_tour(self, starting_depot, workers=None, boundary_candidates=32):
+        """
+        A tour from starting_depot that visits the settlements region by
+        region, for Countries too large for a flat nn_tour.
+
+        The regions are first put in order by a small tour over the
+        regions themselves: each is represented by its centroid, and the
+        cost of moving into it includes its population penalty, as in
+        travel_time. Consecutive regions are then joined at their cheapest
+        boundary pair (the fastest trip from a settlement of one to a
+        settlement of the next, among the boundary_candidates settlements
+        of each nearest the other region), and each region is toured by
+        nearest neighbour from where the tour enters it to where it
+        leaves. The regions are independent once their entry and exit
+        are fixed, so they can be toured concurrently.
+
+        The region order is found with a GridIndex over the centroids,
+        and improved with moves between each region and its 8 nearest,
+        so it takes roughly linear time and memory in the number of
+        regions. Touring the regions then grows with the sum of their
+        squared sizes rather than with the square of the number of
+        settlements.
+
+        Parameters
+        ----------
+        starting_depot : Location
+        workers : int, optional
+            If given, the regions are toured across a pool of this many
+            processes, as in depot_tour_times.
+        boundary_candidates : int, default: 32
+
+        Returns
+        -------
+        tour : list of Location
+            Starts and ends at starting_depot, visiting every settlement.
+        total_time : float
+        """
+        self._refresh_depots()
+        if starting_depot not in self or not self._depot_mask[self._location_id(starting_depot)]:
+            raise ValueError(f"Starting location {starting_depot} is not a depot in the Country")
+        depot_id = self._location_id(starting_depot)
+        arrays, matrix = self._location_arrays, self._affordable_matrix()
+
+        settlement_ids = self._settlement_ids
+        settlement_codes = arrays.region_codes[settlement_ids]
+        by_region = np.argsort(settlement_codes, kind="stable")
+        instrumentation.count("sort")
+        codes, starts = np.unique(settlement_codes[by_region], return_index=True)
+        members = np.split(settlement_ids[by_region], starts[1:]) if len(codes) else []
+
+        # Node 0 of the region tour is the depot, node i the i-th region.
+        centre_x = np.array([arrays.x[depot_id], *(arrays.x[ids].mean() for ids in members)])
+        centre_y = np.array([arrays.y[depot_id], *(arrays.y[ids].mean() for ids in members)])
+        node_codes = np.array([arrays.region_codes[depot_id], *codes])
+        node_penalty = 1 + arrays.region_counts[node_codes] / 10
+
+        def region_costs(from_nodes, to_nodes):
+            distance = np.hypot(centre_x[from_nodes] - centre_x[to_nodes], centre_y[from_nodes] - centre_y[to_nodes])
+            return distance * np.where(node_codes[from_nodes] != node_codes[to_nodes], node_penalty[to_nodes], 1.0)
+
+        def region_cost(from_node, to_node):
+            return float(region_costs(from_node, to_node))
+
+        # Nearest neighbour over the regions, with the penalty (at least 1)
+        # bounding a GridIndex search as in _GridScanner. The shortlist is
+        # re-ranked by region_costs, ties going to the lowest node.
+        n_nodes = len(node_codes)
+        with instrumentation.phase("index_build"):
+            unvisited = GridIndex(centre_x, centre_y, np.arange(1, n_nodes))
+        region_order = [0]
+        while len(unvisited):
+            current = region_order[-1]
+            nodes, _ = unvisited.nearest(
+                centre_x[current],
+                centre_y[current],
+                weights=lambda nodes: np.where(node_codes[nodes] != node_codes[current], node_penalty[nodes] ** 2, 1.0),
+                rel_tol=1e-9,
+            )
+            nodes = np.sort(nodes)
+            region_order.append(int(nodes[np.argmin(region_costs(current, nodes))]))
+            unvisited.remove(region_order[-1])
+
+        # Each region only considers new legs to its nearest few, found by
+        # distance and kept by cost as in _neighbour_lists.
+        n_neighbours = 8
+        with instrumentation.phase("index_build"):
+            everywhere = GridIndex(centre_x, centre_y, np.arange(n_nodes))
+        neighbours = []
+        for node in range(n_nodes):
+            nearest = everywhere.k_nearest(centre_x[node], centre_y[node], 4 * n_neighbours + 1)
+            nearest = nearest[nearest != node]
+            neighbours.append(nearest[np.argsort(region_costs(node, nearest), kind="stable")[:n_neighbours]].tolist())
+        region_order = improve_tour(region_order, region_cost, neighbours, leg_times=region_costs)[1:]
+
+        # Choose where the tour enters and leaves each region, in order: it
+        # enters at the fastest trip from where it left the previous one,
+        # and leaves by the cheapest pair into the next region.
+        entries, exits = [], []
+        previous = depot_id
+        for position, node in enumerate(region_order):
+            ids = members[node - 1]
+            entry_to = _closest_to_point(arrays, ids, arrays.x[previous], arrays.y[previous], boundary_candidates)
+            entry = int(entry_to[np.argmin(_times_between(arrays, matrix, previous, entry_to))])
+
+            following = members[region_order[position + 1] - 1] if position + 1 < len(region_order) else None
+            if following is None:
+                following = np.array([depot_id])
+                following_x, following_y = arrays.x[depot_id], arrays.y[depot_id]
+            else:
+                following_x, following_y = centre_x[region_order[position + 1]], centre_y[region_order[position + 1]]
+                following = _closest_to_point(arrays, following, centre_x[node], centre_y[node], boundary_candidates)
+            leaving = ids[ids != entry] if len(ids) > 1 else ids
+            exit_from = _closest_to_point(arrays, leaving, following_x, following_y, boundary_candidates)
+            times = _times_between(arrays, matrix, exit_from[:, np.newaxis], following)
+            exit_id = int(exit_from[np.unravel_index(np.argmin(times), times.shape)[0]])
+
+            entries.append(entry)
+            exits.append(exit_id)
+            previous = exit_id
+
+        tasks = [
+            (entry, ids[(ids != entry) & (ids != exit_id)])
+            for entry, exit_id, ids in zip(entries, exits, (members[node - 1] for node in region_order))
+        ]
+        if workers is None:
+            paths = [
+                _nn_tour_ids(entry, _tour_scanner(ids, arrays, matrix), arrays) for entry, ids in tasks
+            ]
+        else:
+            paths = self._map_over_tour_pool(_cluster_tour_worker, tasks, workers)
 
-        best_depot = None
-        best_tour = None
-        shortest_time = float('inf')
+        order = []
+        for entry, exit_id, (path, _) in zip(entries, exits, paths):
+            order.append(entry)
+            order.extend(path.tolist())
+            if exit_id != entry:
+                order.append(exit_id)
+        order = np.array(order, dtype=np.intp)
 
-        for depot in self.depots:
-            tour, tour_time = self.nn_tour(depot)
+        total_time = _tour_prefix_time(depot_id, order, arrays, matrix)
+        last = int(order[-1]) if len(order) else depot_id
+        total_time += float(_times_between(arrays, matrix, last, depot_id))
+        return [starting_depot, *(self._location(i) for i in order), starting_depot], total_time
+
+    def _incremental_tour_times(self):
+        if self._tour_cache is None:
+            self._tour_cache = {}
+            self._tour_cache_mask = self._depot_mask.copy()
+        self._sync_tour_cache()
+
+        arrays, matrix = self._location_arrays, self._affordable_matrix()
+        settlement_ids = self._settlement_ids
+        changed_regions = self._changed_regions
+        candidates = np.union1d(
+            settlement_ids[np.isin(arrays.region_codes[settlement_ids], list(changed_regions))],
+            np.intersect1d(list(self._new_settlement_ids), settlement_ids),
+        ).astype(np.intp)
+
+        tour_times = []
+        for depot_id in self._depot_ids.tolist():
+            order = self._tour_cache.get(depot_id, np.empty(0, dtype=np.intp))
+            prefix = order[:_first_changed_step(depot_id, order, settlement_ids, candidates, arrays, matrix, changed_regions)]
+            unvisited = settlement_ids[~np.isin(settlement_ids, prefix)]
+            rest, total_time = _nn_tour_ids(
+                int(prefix[-1]) if len(prefix) else depot_id,
+                _tour_scanner(unvisited, arrays, matrix),
+                arrays,
+                home_id=depot_id,
+                total_time=_tour_prefix_time(depot_id, prefix, arrays, matrix),
+            )
+            self._tour_cache[depot_id] = np.concatenate((prefix, rest))
+            tour_times.append(total_time)
+
+        self._changed_regions = set()
+        self._new_settlement_ids = set()
+        return tour_times
+
+    def _sync_tour_cache(self):
+        # Depot flags flipped since the tours were kept: a new depot drops
+        # out of every tour from the step that visited it, and a former
+        # depot becomes a settlement that may now win any step.
+        for location_id in np.flatnonzero(self._depot_mask != self._tour_cache_mask).tolist():
+            if self._depot_mask[location_id]:
+                for depot_id, order in self._tour_cache.items():
+                    self._tour_cache[depot_id] = order[:np.flatnonzero(np.append(order == location_id, True))[0]]
+            else:
+                self._tour_cache.pop(location_id, None)
+                self._new_settlement_ids.add(location_id)
+        self._tour_cache_mask = self._depot_mask.copy()
+
+    @_instrumented
+    def best_depot_site(
+        self,
+        display=True,
+        workers=None,
+        improve=False,
+        time_budget=None,
+        incremental=False,
+        exact=False,
+        memory_limit=None,
+        prune=False,
+    ):
+        """
+        The depot with the fastest tour, as timed by depot_tour_times
+        (whose options this takes). Ties go to the depot first by name.
+
+        Parameters
+        ----------
+        display : bool, default: True
+            If True, print the best depot and its tour.
+        prune : bool, default: False
+            If True, depots are tried from the one closest on average to
+            the settlements, and a depot's nearest-neighbour tour is given
+            up as soon as it can no longer beat the best so far. The
+            answer is the same; it cannot be combined with workers,
+            improve, exact or incremental.
+
+        Returns
+        -------
+        Location
+        """
+        if not self.depots:
+            raise ValueError("No depots available in the country.")
+
+        if prune:
+            if workers is not None or improve or exact or incremental:
+                raise ValueError("Pruning cannot be combined with workers, improve, exact or incremental.")
+            best_depot, shortest_time = self._pruned_best_depot()
+            tour_times = {}
+        else:
+            best_depot = None
+            shortest_time = float('inf')
+            tour_times = self.depot_tour_times(
+                workers=workers,
+                improve=improve,
+                time_budget=time_budget,
+                incremental=incremental,
+                exact=exact,
+                memory_limit=memory_limit,
+            )
+        for depot, tour_time in tour_times.items():
             if tour_time < shortest_time or (tour_time == shortest_time and (depot.name < best_depot.name if best_depot else True)):
                 best_depot = depot
-                best_tour = tour
                 shortest_time = tour_time
 
         if display:
+            if exact:
+                best_tour, _ = self.optimal_tour(best_depot, memory_limit=memory_limit, time_budget=time_budget)
+            elif improve:
+                best_tour, _ = self.improve_tour(self.nn_tour(best_depot)[0], time_budget=time_budget)
+            else:
+                # Printed as it is decided, rather than built up first.
+                best_tour = (location for location, _, _ in self.iter_nn_tour(best_depot))
             print(f"Best depot: {best_depot}")
-            print("NNA tour is:")
+            print("Optimal tour is:" if exact else "Improved NNA tour is:" if improve else "NNA tour is:")
             for location in best_tour:
                 print(f"\t{location}")
             print(f"Which will take {shortest_time:.2f} h to complete.")
 
         return best_depot
 
+    def _pruned_best_depot(self):
+        # Nearest-neighbour tours from each depot, abandoned once their
+        # time so far plus a lower bound on the rest (see
+        # _TourLowerBound) exceeds the best complete tour.
+        arrays, matrix = self._location_arrays, self._affordable_matrix()
+        depot_ids, settlement_ids = self._depot_ids.tolist(), self._settlement_ids
+        entry_times = _entry_time_bounds(arrays, settlement_ids, matrix)
+
+        def mean_trip(depot_id):
+            if not len(settlement_ids):
+                return 0.0
+            return float(_times_between(arrays, matrix, depot_id, settlement_ids).mean())
+
+        by_mean_trip = sorted(range(len(depot_ids)), key=lambda position: mean_trip(depot_ids[position]))
+        best_key = None
+        for position in by_mean_trip:
+            depot_id = depot_ids[position]
+            cutoff = None if best_key is None else best_key[0] * (1 + _PRUNING_SLACK)
+            bound = _TourLowerBound(
+                *entry_times,
+                arrays,
+                settlement_ids,
+                depot_id,
+                _times_between(arrays, matrix, depot_id, settlement_ids),
+                _times_between(arrays, matrix, settlement_ids, depot_id),
+            )
+            _, total_time = _nn_tour_ids(
+                depot_id, _tour_scanner(settlement_ids, arrays, matrix), arrays, cutoff=cutoff, bound=bound
+            )
+            if total_time is None:
+                continue
+            key = (total_time, self._names[depot_id], position)
+            if best_key is None or key < best_key:
+                best_key = key
+        return self._location(depot_ids[best_key[2]]), best_key[0]
+
     def plot_country(
         self,
         distinguish_regions: bool = True,
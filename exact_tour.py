@@ -0,0 +1,177 @@
+"""
+Exact solvers for the shortest closed tour over a small travel-time
+matrix: Held-Karp dynamic programming over bitmasks, and a branch-and-
+bound search for when the dynamic programming table would not fit in
+memory.
+
+In both, node 0 of the matrix is the depot the tour starts and ends at,
+and tour times are summed leg by leg from the depot, the same way
+Country.nn_tour sums them.
+"""
+
+from __future__ import annotations
+
+import math
+import sys
+import time
+
+import numpy as np
+
+
+def held_karp_memory(n_stops):
+    """
+    Bytes held_karp allocates at most for a tour through n_stops stops:
+    the table, the cost matrix, the arrays of subset masks and sizes, and
+    the temporaries of its largest vectorized step.
+    """
+    if n_stops <= 0:
+        return (n_stops + 1) ** 2 * 8
+    n_subsets = 1 << n_stops
+    largest_layer = math.comb(n_stops, n_stops // 2)
+    largest_step = math.comb(n_stops - 1, (n_stops - 1) // 2)
+    return (
+        n_subsets * n_stops * 8  # dp
+        + (n_stops + 1) ** 2 * 8  # costs
+        + n_subsets * (4 * 8 + 1)  # masks, sizes, the temporaries counting them, a boolean mask
+        + largest_layer * 3 * 8  # the layer, its subsets ending at a stop, and those without it
+        + largest_step * n_stops * 2 * 8  # their rows of dp, and those plus the step's costs
+    )
+
+
+def held_karp(costs):
+    """
+    Shortest tour from node 0 through every other node and back.
+
+    The table dp[mask, j] (shortest path from node 0 through the stops in
+    mask, ending at stop j) is filled one subset size at a time, with
+    every subset of that size and every last stop j handled in one
+    vectorized step. It takes held_karp_memory(len(costs) - 1) bytes.
+
+    Parameters
+    ----------
+    costs : ndarray of float, shape (n + 1, n + 1)
+        costs[i, j] is the time from node i to node j.
+
+    Returns
+    -------
+    order : list of int
+        Nodes 1..n in the order they are visited.
+    total_time : float
+    """
+    costs = np.asarray(costs, dtype=float)
+    n_stops = len(costs) - 1
+    if n_stops <= 0:
+        return [], float(costs[0, 0]) if len(costs) else 0.0
+
+    stop_costs = costs[1:, 1:]
+    masks = np.arange(1 << n_stops)
+    sizes = np.zeros(len(masks), dtype=np.intp)
+    for stop in range(n_stops):
+        sizes += (masks >> stop) & 1
+
+    dp = np.full((len(masks), n_stops), np.inf)
+    dp[1 << np.arange(n_stops), np.arange(n_stops)] = costs[0, 1:]
+    for size in range(2, n_stops + 1):
+        layer = masks[sizes == size]
+        for stop in range(n_stops):
+            ending_here = layer[(layer >> stop) & 1 == 1]
+            # Stops not in the previous subset are inf there, so they drop out.
+            dp[ending_here, stop] = (dp[ending_here ^ (1 << stop)] + stop_costs[:, stop]).min(axis=1)
+
+    full = len(masks) - 1
+    last = int(np.argmin(dp[full] + costs[1:, 0]))
+    total_time = float(dp[full, last] + costs[last + 1, 0])
+
+    order = [last]
+    mask = full
+    while mask != 1 << last:
+        mask ^= 1 << last
+        last = int(np.argmin(dp[mask] + stop_costs[:, last]))
+        order.append(last)
+    return [stop + 1 for stop in reversed(order)], total_time
+
+
+def branch_and_bound(costs, initial_order, time_budget=None):
+    """
+    Shortest tour from node 0 through every other node and back, by
+    depth-first search that abandons a partial tour once its time plus a
+    lower bound on the rest cannot beat the best tour found so far.
+
+    The lower bound is the larger of: the cheapest way into each node
+    still to be entered (the unvisited stops, and the depot), and the
+    cheapest way out of each node still to be left (the current stop and
+    the unvisited ones). Stops are tried nearest first.
+
+    Parameters
+    ----------
+    costs : ndarray of float, shape (n + 1, n + 1)
+    initial_order : list of int
+        A known tour (such as the nearest-neighbour one), used as the
+        first upper bound.
+    time_budget : float, optional
+        Seconds after which the search stops with the best tour so far.
+
+    Returns
+    -------
+    order : list of int
+    total_time : float
+    optimal : bool
+        False if the time budget ran out before the search finished.
+    """
+    costs = np.asarray(costs, dtype=float)
+    n_nodes = len(costs)
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+
+    others = np.where(np.eye(n_nodes, dtype=bool), np.inf, costs)
+    min_in = others.min(axis=0).tolist() if n_nodes > 1 else [0.0]
+    min_out = others.min(axis=1).tolist() if n_nodes > 1 else [0.0]
+    cost_rows = costs.tolist()
+    nearest_first = [
+        [int(v) for v in np.argsort(costs[u], kind="stable") if v != 0 and v != u] for u in range(n_nodes)
+    ]
+
+    def tour_time(order):
+        total, current = 0, 0
+        for stop in order:
+            total += cost_rows[current][stop]
+            current = stop
+        return total + cost_rows[current][0]
+
+    best = {"order": list(initial_order), "time": tour_time(initial_order)}
+    # Guards the bound against rounding making it a hair too large.
+    slack = 1 - 1e-12
+
+    class OutOfTime(Exception):
+        pass
+
+    def visit(current, visited, elapsed, path, remaining_in, remaining_out):
+        if len(path) == n_nodes - 1:
+            total = elapsed + cost_rows[current][0]
+            if total < best["time"]:
+                best["order"], best["time"] = list(path), total
+            return
+        if deadline is not None and time.perf_counter() > deadline:
+            raise OutOfTime
+        for stop in nearest_first[current]:
+            if visited >> stop & 1:
+                continue
+            leg_elapsed = elapsed + cost_rows[current][stop]
+            # Still to be entered: the other unvisited stops and the depot.
+            # Still to be left: this stop and the other unvisited ones.
+            bound = leg_elapsed + max(remaining_in - min_in[stop] + min_in[0], remaining_out)
+            if bound * slack >= best["time"]:
+                continue
+            path.append(stop)
+            visit(stop, visited | 1 << stop, leg_elapsed, path, remaining_in - min_in[stop], remaining_out - min_out[stop])
+            path.pop()
+
+    optimal = True
+    recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(recursion_limit, n_nodes + 100))
+    try:
+        visit(0, 1, 0, [], sum(min_in[1:]), sum(min_out[1:]))
+    except OutOfTime:
+        optimal = False
+    finally:
+        sys.setrecursionlimit(recursion_limit)
+    return best["order"], best["time"], optimal
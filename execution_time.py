@@ -1,26 +1,312 @@
+"""
+Benchmarks for the Country API, run from the command line:
+
+    python execution_time.py [--families ...] [--sizes ...] [--repeats N]
+
+Each benchmarked function is timed over repeated runs on regular n-gons,
+uniform-random Countries and clustered multi-region Countries of several
+sizes. Every run starts from a freshly built Country (outside the timed
+section), so lazily built caches such as the travel-time matrix are
+counted in the time of the call that first needs them. For each function,
+family and size the median and percentiles of the run times and the peak
+memory allocated during one extra, untimed run are recorded, and an
+empirical complexity exponent k (time ~ n**k) is fitted over the sizes.
+
+The results are written as JSON so that they can be compared across
+commits, and the nn_tour timings on regular n-gons are plotted to
+report/nna_execution_times.png.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
 import numpy as np
-import matplotlib.pyplot as plt
-from timeit import timeit
-from utilities import regular_n_gon
-
-location_counts = np.unique(np.logspace(0, 9, base=2, num=75, dtype=int))
-
-execution_times = []
-
-for count in location_counts:
-    country = regular_n_gon(count)
-    
-    depot = country.depots[0]
-    time = timeit(lambda: country.nn_tour(depot), number=1)
-    
-    execution_times.append(time)
-    print(f"Processed {count} locations in {time:.4f} seconds.")
-
-plt.figure(figsize=(10, 6))
-plt.plot(location_counts, execution_times, marker='o', linestyle='-')
-plt.xlabel("Number of Locations (n)")
-plt.ylabel("Execution Time (seconds)")
-plt.title("NNA Execution Time vs. Number of Locations")
-plt.grid(True)
-plt.savefig("report/nna_execution_times.png")
-plt.show()
\ No newline at end of file
+
+from country import Country, Location
+from utilities import read_country_data, regular_n_gon
+
+FAMILIES = ("n_gon", "uniform", "clustered")
+FUNCTIONS = ("read_country_data", "travel_time", "fastest_trip_from", "nn_tour", "best_depot_site")
+DEFAULT_SIZES = (16, 32, 64, 128, 256, 512, 1024)
+PERCENTILES = (10, 25, 75, 90)
+
+# Number of calls made in one timed run of the cheap, per-trip functions.
+TRAVEL_TIME_CALLS = 1_000
+FASTEST_TRIP_CALLS = 20
+
+REPORT_DIR = Path(__file__).resolve().parent / "report"
+
+
+def uniform_country(n_locations: int, seed: int = 0, n_regions: int = 8, n_depots: int = 4) -> Country:
+    """
+    A Country of n_locations spread uniformly over a disc, each in one of
+    n_regions random regions; the first n_depots locations are depots.
+    """
+    rng = random.Random(seed)
+    radius = 100_000.0
+    return Country([
+        Location(
+            f"Location {i}",
+            f"Region {rng.randrange(n_regions)}",
+            radius * math.sqrt(rng.random()),
+            rng.uniform(-math.pi, math.pi),
+            i < n_depots,
+        )
+        for i in range(n_locations)
+    ])
+
+
+def clustered_country(n_locations: int, seed: int = 0, n_clusters: int = 8, n_depots: int = 4) -> Country:
+    """
+    A Country of n_locations gathered in n_clusters tight clusters, each
+    cluster being its own region; the first n_depots locations are depots.
+    """
+    rng = random.Random(seed)
+    radius, spread = 100_000.0, 8_000.0
+    centres = [
+        (radius * math.sqrt(rng.random()), rng.uniform(-math.pi, math.pi)) for _ in range(n_clusters)
+    ]
+    locations = []
+    for i in range(n_locations):
+        cluster = rng.randrange(n_clusters)
+        centre_r, centre_theta = centres[cluster]
+        x = centre_r * math.cos(centre_theta) + rng.gauss(0.0, spread)
+        y = centre_r * math.sin(centre_theta) + rng.gauss(0.0, spread)
+        locations.append(
+            Location(f"Location {i}", f"Region {cluster}", math.hypot(x, y), math.atan2(y, x), i < n_depots)
+        )
+    return Country(locations)
+
+
+def make_country(family: str, n_locations: int, seed: int = 0) -> Country:
+    if family == "n_gon":
+        # regular_n_gon adds the depot at the origin to its settlements.
+        return regular_n_gon(max(n_locations - 1, 0))
+    if family == "uniform":
+        return uniform_country(n_locations, seed)
+    if family == "clustered":
+        return clustered_country(n_locations, seed)
+    raise ValueError(f"Unknown country family {family!r}")
+
+
+def write_country_csv(country: Country, file_path: Path) -> None:
+    with file_path.open("w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["location", "r", "theta", "region", "depot"])
+        for location in country._all_locations:
+            writer.writerow([location.name, repr(location.r), repr(location.theta), location.region, location.depot])
+
+
+def _prepare(function: str, family: str, n_locations: int, seed: int, scratch_dir: Path):
+    """
+    Returns setup, a callable that builds the inputs for one run (and is
+    not timed), and run, which performs the timed work on those inputs.
+    """
+    template = make_country(family, n_locations, seed)
+    locations = list(template._all_locations)
+
+    def fresh_country():
+        return Country(locations)
+
+    if function == "read_country_data":
+        csv_file = scratch_dir / f"{family}_{n_locations}.csv"
+        write_country_csv(template, csv_file)
+        return (lambda: csv_file), read_country_data
+
+    rng = random.Random(seed)
+    if function == "travel_time":
+        pairs = [(rng.choice(locations), rng.choice(locations)) for _ in range(TRAVEL_TIME_CALLS)]
+
+        def run(country):
+            for start, end in pairs:
+                country.travel_time(start, end)
+
+        return fresh_country, run
+
+    if function == "fastest_trip_from":
+        origins = [rng.choice(locations) for _ in range(FASTEST_TRIP_CALLS)]
+
+        def run(country):
+            for origin in origins:
+                country.fastest_trip_from(origin)
+
+        return fresh_country, run
+
+    if function == "nn_tour":
+        depot = template.depots[0]
+        return fresh_country, lambda country: country.nn_tour(depot)
+
+    if function == "best_depot_site":
+        return fresh_country, lambda country: country.best_depot_site(display=False)
+
+    raise ValueError(f"Unknown function {function!r}")
+
+
+def time_function(function: str, family: str, n_locations: int, repeats: int, seed: int, scratch_dir: Path) -> dict:
+    """Times repeats runs of one benchmark and measures its peak memory."""
+    setup, run = _prepare(function, family, n_locations, seed, scratch_dir)
+
+    times = []
+    for _ in range(repeats):
+        argument = setup()
+        start = time.perf_counter()
+        run(argument)
+        times.append(time.perf_counter() - start)
+
+    argument = setup()
+    tracemalloc.start()
+    try:
+        run(argument)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        "function": function,
+        "family": family,
+        "n": n_locations,
+        "repeats": repeats,
+        "times": times,
+        "median": float(np.median(times)),
+        "min": min(times),
+        "max": max(times),
+        "peak_memory_bytes": peak_memory,
+    }
+    for percentile in PERCENTILES:
+        result[f"p{percentile}"] = float(np.percentile(times, percentile))
+    return result
+
+
+def fit_exponent(sizes, medians):
+    """
+    Least-squares fit of log(time) = k log(n) + c, returning (k, c), or
+    None when there are fewer than two usable points.
+    """
+    points = [(n, t) for n, t in zip(sizes, medians) if n > 0 and t > 0]
+    if len(points) < 2 or len({n for n, _ in points}) < 2:
+        return None
+    log_n, log_t = np.log([n for n, _ in points]), np.log([t for _, t in points])
+    exponent, intercept = np.polyfit(log_n, log_t, 1)
+    return float(exponent), float(intercept)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(functions=FUNCTIONS, families=FAMILIES, sizes=DEFAULT_SIZES, repeats=5, seed=0, verbose=True) -> dict:
+    """
+    Runs every combination of functions, families and sizes, and returns
+    the results, exponent fits and run metadata as a JSON-ready dict.
+    Progress goes to stderr if verbose, so stdout is left for the JSON.
+    """
+    results, fits = [], []
+    with tempfile.TemporaryDirectory() as scratch:
+        for function in functions:
+            for family in families:
+                rows = []
+                for n_locations in sizes:
+                    row = time_function(function, family, n_locations, repeats, seed, Path(scratch))
+                    rows.append(row)
+                    if verbose:
+                        print(
+                            f"{function:>17} {family:>9} n={n_locations:<7} "
+                            f"median {row['median']:.4g} s, peak {row['peak_memory_bytes'] / 2**20:.1f} MiB",
+                            file=sys.stderr,
+                        )
+                results.extend(rows)
+
+                fit = fit_exponent([row["n"] for row in rows], [row["median"] for row in rows])
+                if fit is not None:
+                    fits.append({"function": function, "family": family, "exponent": fit[0], "log_coefficient": fit[1]})
+                    if verbose:
+                        print(f"{function:>17} {family:>9} time ~ n^{fit[0]:.2f}", file=sys.stderr)
+
+    return {
+        "metadata": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeats": repeats,
+            "seed": seed,
+            "travel_time_calls_per_run": TRAVEL_TIME_CALLS,
+            "fastest_trip_calls_per_run": FASTEST_TRIP_CALLS,
+        },
+        "results": results,
+        "fits": fits,
+    }
+
+
+def plot_nn_tour_times(report: dict, save_to: Path) -> None:
+    import matplotlib.pyplot as plt
+
+    rows = [row for row in report["results"] if row["function"] == "nn_tour" and row["family"] == "n_gon"]
+    if not rows:
+        return
+    sizes = [row["n"] for row in rows]
+
+    plt.figure(figsize=(10, 6))
+    plt.plot(sizes, [row["median"] for row in rows], marker='o', linestyle='-', label="median")
+    plt.fill_between(sizes, [row["p10"] for row in rows], [row["p90"] for row in rows], alpha=0.3, label="10th-90th percentile")
+    plt.xlabel("Number of Locations (n)")
+    plt.ylabel("Execution Time (seconds)")
+    plt.title("NNA Execution Time vs. Number of Locations")
+    plt.legend()
+    plt.grid(True)
+    plt.savefig(save_to)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--functions", nargs="+", choices=FUNCTIONS, default=list(FUNCTIONS))
+    parser.add_argument("--families", nargs="+", choices=FAMILIES, default=list(FAMILIES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES), help="Numbers of locations")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per function, family and size")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the random Countries")
+    parser.add_argument(
+        "--json", type=Path, default=REPORT_DIR / "benchmarks.json", help="Where to write the results ('-' for stdout)"
+    )
+    parser.add_argument(
+        "--plot", default=str(REPORT_DIR / "nna_execution_times.png"),
+        help="Where to save the nn_tour plot (empty to skip)",
+    )
+    parser.add_argument("--quiet", action="store_true", help="Only write the JSON")
+    args = parser.parse_args(argv)
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+
+    report = run_benchmarks(args.functions, args.families, args.sizes, args.repeats, args.seed, verbose=not args.quiet)
+
+    if str(args.json) == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        args.json.write_text(json.dumps(report, indent=2))
+    if args.plot:
+        plot_nn_tour_times(report, Path(args.plot))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
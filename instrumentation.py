@@ -0,0 +1,142 @@
+"""
+Opt-in counters and phase timers for the Country hot paths.
+
+The kernels report what they do through count() and phase(), which go
+to the Instrumentation being recorded into in the current context (see
+recording), and do nothing at all otherwise. Country switches recording
+on around each of its public calls once enable_instrumentation has been
+called on it.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+COUNTERS = ("travel_time", "distance_to", "membership_check", "sort")
+PHASES = ("index_build", "matrix_build", "tour_construction", "improvement", "exact_search")
+
+_current = ContextVar("current_instrumentation", default=None)
+_NO_PHASE = nullcontext()
+
+# True while anything, in any thread, is being recorded. The cheapest
+# possible check, for scalar hot paths to skip count() calls entirely.
+enabled = False
+_n_recording = 0
+_n_recording_lock = threading.Lock()
+
+
+class Instrumentation:
+    """
+    Counts of hot-path operations and time spent in each phase.
+
+    Counters
+    --------
+    travel_time
+        Travel times computed, one per trip (a batch of n counts n).
+    distance_to
+        Distances computed: Location.distance_to calls, and the
+        Cartesian distance estimates the tour scanners rank trips by.
+    membership_check
+        Lookups of a Location in a Country, and candidates tested for
+        membership while scanning a sorted neighbour list.
+    sort
+        Sorts (argsort, lexsort) performed.
+
+    Phases
+    ------
+    index_build, matrix_build, tour_construction, improvement, exact_search
+        Each phase's wall-clock seconds and number of times it ran. Phases
+        can nest, such as a matrix_build inside a tour_construction, and
+        each is timed inclusively.
+    """
+
+    def __init__(self):
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self.phase_calls = dict.fromkeys(PHASES, 0)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_phase(self, name, seconds):
+        self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + seconds
+        self.phase_calls[name] = self.phase_calls.get(name, 0) + 1
+
+    def merge(self, other):
+        """Adds the counts and times of another Instrumentation to this one."""
+        for name, n in other.counters.items():
+            self.count(name, n)
+        for name, seconds in other.phase_seconds.items():
+            self.phase_seconds[name] = self.phase_seconds.get(name, 0.0) + seconds
+            self.phase_calls[name] = self.phase_calls.get(name, 0) + other.phase_calls[name]
+
+    def stats(self):
+        """
+        The counts and times as a plain dict:
+        {"counters": {name: n}, "phases": {name: {"seconds": s, "calls": n}}}.
+        """
+        return {
+            "counters": dict(self.counters),
+            "phases": {
+                name: {"seconds": seconds, "calls": self.phase_calls[name]}
+                for name, seconds in self.phase_seconds.items()
+            },
+        }
+
+
+class _Phase:
+    __slots__ = ("_instrumentation", "_name", "_start")
+
+    def __init__(self, instrumentation, name):
+        self._instrumentation = instrumentation
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._instrumentation.add_phase(self._name, time.perf_counter() - self._start)
+        return False
+
+
+def active():
+    """Whether anything is being recorded in the current context."""
+    return _current.get() is not None
+
+
+def count(name, n=1):
+    """Adds n to the named counter, if recording."""
+    if not enabled:
+        return
+    instrumentation = _current.get()
+    if instrumentation is not None:
+        instrumentation.count(name, n)
+
+
+def phase(name):
+    """Context manager timing the named phase, if recording."""
+    instrumentation = _current.get() if enabled else None
+    if instrumentation is None:
+        return _NO_PHASE
+    return _Phase(instrumentation, name)
+
+
+@contextmanager
+def recording(instrumentation):
+    """Records count() and phase() calls into instrumentation while active."""
+    global enabled, _n_recording
+    with _n_recording_lock:
+        _n_recording += 1
+        enabled = True
+    token = _current.set(instrumentation)
+    try:
+        yield instrumentation
+    finally:
+        _current.reset(token)
+        with _n_recording_lock:
+            _n_recording -= 1
+            enabled = _n_recording > 0
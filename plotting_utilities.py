@@ -67,7 +67,14 @@ def plot_country(
     if distinguish_depots:
         MARKERS["depot"] = "x"
 
-    all_regions = set(loc.region for loc in country._all_locations)
+    # The Country's cached columns, including the Cartesian coordinates
+    # its tour code uses, rather than an array rebuilt from the Locations
+    # for every region.
+    arrays = country._location_arrays
+    country._refresh_depots()
+    depot_mask = country._depot_mask
+    code_of = {country._region_names[code]: code for code in np.unique(arrays.region_codes).tolist()}
+    all_regions = set(code_of)
     n_regions = len(all_regions)
     region_colourmap = {region: "b" for region in all_regions}
     if distinguish_regions and n_regions > 1:
@@ -86,19 +93,13 @@ def plot_country(
             marker = MARKERS["depot"] if is_depot else MARKERS["default"]
             label = f"{region} (depots)" if is_depot and distinguish_depots else region
 
-            locations_in_region = [
-                loc
-                for loc in country._all_locations
-                if loc.region == region and loc.depot == is_depot
-            ]
-            data = np.array(
-                [(loc.theta, loc.r) for loc in locations_in_region],
-                dtype=(float, float),
-            )
-            if data.size == 0:
+            ids = np.flatnonzero((arrays.region_codes == code_of[region]) & (depot_mask == is_depot))
+            if ids.size == 0:
                 continue
-            elif not polar_projection:
-                data = polar_to_xy(data)
+            elif polar_projection:
+                data = np.column_stack((arrays.theta[ids], arrays.r[ids]))
+            else:
+                data = np.column_stack((arrays.x[ids], arrays.y[ids]))
 
             ax.scatter(
                 data[:, 0],
@@ -109,11 +110,12 @@ def plot_country(
             )
 
             if location_names:
-                for i, loc in enumerate(locations_in_region):
+                for i, location_id in enumerate(ids.tolist()):
+                    name = country._names[location_id]
                     if distinguish_depots and is_depot:
-                        ax.annotate(loc.name.upper(), data[i, :], ha="center", va="top")
+                        ax.annotate(name.upper(), data[i, :], ha="center", va="top")
                     else:
-                        ax.annotate(loc.name, data[i, :], ha="center", va="bottom")
+                        ax.annotate(name, data[i, :], ha="center", va="bottom")
 
     if distinguish_depots or distinguish_regions:
         ax.legend(
@@ -158,9 +160,20 @@ def plot_path(
     is_polar = ax.name == "polar"
 
     # We just need to draw lines between the relevant points, so let's do that
-    data = np.array([(loc.theta, loc.r) for loc in path], dtype=(float, float))
-    if not is_polar:
-        data = polar_to_xy(data)
+    arrays = country._location_arrays
+    try:
+        ids = country.location_ids(path)
+    except ValueError:
+        # Some stops are not in the Country, so the path is plotted from
+        # the Locations' own coordinates.
+        data = np.array([(location.theta, location.r) for location in path], dtype=float).reshape(-1, 2)
+        if not is_polar:
+            data = polar_to_xy(data)
+    else:
+        if is_polar:
+            data = np.column_stack((arrays.theta[ids], arrays.r[ids]))
+        else:
+            data = np.column_stack((arrays.x[ids], arrays.y[ids]))
     ax.plot(data[:, 0], data[:, 1], "--", marker=None)
 
     if save_to is not None:
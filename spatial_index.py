@@ -0,0 +1,167 @@
+"""
+A uniform-grid spatial index over the Cartesian positions of Locations,
+used to answer "nearest remaining location" queries while locations are
+being removed (as they are visited during a tour).
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+
+class GridIndex:
+    """
+    Buckets location ids into square cells so that a nearest-point query
+    only has to look at the cells around the query point.
+
+    Parameters
+    ----------
+    x, y : array of float
+        Cartesian coordinates of every location, indexed by location id.
+    ids : array of int
+        The ids of the locations to insert into the index.
+    points_per_cell : float, default: 2.0
+        Average number of locations per cell the grid is sized for.
+    """
+
+    def __init__(self, x, y, ids, points_per_cell=2.0):
+        self._x = np.asarray(x, dtype=float)
+        self._y = np.asarray(y, dtype=float)
+        self._points_per_cell = points_per_cell
+        self._position = np.full(len(self._x), -1, dtype=np.intp)
+        self._build(np.asarray(ids, dtype=np.intp))
+
+    def __len__(self):
+        return self._n_alive
+
+    def _build(self, ids):
+        n_points = len(ids)
+        xs, ys = self._x[ids], self._y[ids]
+        self._x0 = float(xs.min()) if n_points else 0.0
+        self._y0 = float(ys.min()) if n_points else 0.0
+        width = float(xs.max()) - self._x0 if n_points else 0.0
+        height = float(ys.max()) - self._y0 if n_points else 0.0
+
+        # Square cells sized for the requested density, but never so small
+        # that a long, thin spread of points needs more than n_cells in a row.
+        n_cells = max(n_points / self._points_per_cell, 1.0)
+        cell_size = max(math.sqrt(width * height / n_cells), max(width, height) / n_cells)
+        self._cell_size = cell_size if cell_size > 0 else 1.0
+        self._nx = int(width / self._cell_size) + 1
+        self._ny = int(height / self._cell_size) + 1
+
+        cells = self._cell_of(xs, ys)
+        order = np.argsort(cells, kind="stable")
+        self._ids = ids[order]
+        self._xs = xs[order]
+        self._ys = ys[order]
+        self._cell_start = np.searchsorted(cells[order], np.arange(self._nx * self._ny + 1))
+        self._alive = np.ones(n_points, dtype=bool)
+        self._position[self._ids] = np.arange(n_points)
+        self._n_alive = n_points
+        self._n_built = n_points
+
+    def _cell_xy(self, x, y):
+        ix = np.clip(np.floor((x - self._x0) / self._cell_size), 0, self._nx - 1).astype(np.intp)
+        iy = np.clip(np.floor((y - self._y0) / self._cell_size), 0, self._ny - 1).astype(np.intp)
+        return ix, iy
+
+    def _cell_of(self, x, y):
+        ix, iy = self._cell_xy(x, y)
+        return ix * self._ny + iy
+
+    def remove(self, location_id):
+        """
+        Remove a location from the index. The grid is rebuilt over the
+        remaining locations once three quarters of it is empty, so
+        queries never have to wade through mostly-empty cells.
+        """
+        position = self._position[location_id]
+        if position < 0 or not self._alive[position]:
+            raise KeyError(f"Location id {location_id} is not in the index")
+        self._alive[position] = False
+        self._position[location_id] = -1
+        self._n_alive -= 1
+
+        if self._n_built > 64 and self._n_alive < self._n_built // 4:
+            self._build(self._ids[self._alive])
+
+    def _block(self, ix, iy, radius):
+        x_lo, x_hi = max(ix - radius, 0), min(ix + radius, self._nx - 1)
+        y_lo, y_hi = max(iy - radius, 0), min(iy + radius, self._ny - 1)
+        ranges = [
+            (self._cell_start[column * self._ny + y_lo], self._cell_start[column * self._ny + y_hi + 1])
+            for column in range(x_lo, x_hi + 1)
+        ]
+        positions = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+        covers_grid = x_lo == 0 and y_lo == 0 and x_hi == self._nx - 1 and y_hi == self._ny - 1
+        return positions[self._alive[positions]], covers_grid
+
+    def nearest(self, x, y, weights=None, abs_tol=0.0, rel_tol=0.0):
+        """
+        Ids of the remaining locations whose (weighted) squared distance
+        from (x, y) is within tolerance of the smallest.
+
+        Parameters
+        ----------
+        x, y : float
+            The query point.
+        weights : callable, optional
+            Maps an array of ids to multipliers (all >= 1) applied to
+            their squared distances. Since the multipliers are at least
+            1, plain distance still gives a valid bound for pruning.
+        abs_tol, rel_tol : float
+            Every location whose key is at most
+            best + abs_tol + rel_tol * best is returned, so that callers
+            can re-rank the shortlist with an exact metric.
+
+        Returns
+        -------
+        ids : array of int
+        keys : array of float
+            The weighted squared distances of those ids.
+        """
+        if self._n_alive == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        ix, iy = self._cell_xy(x, y)
+        radius = 1
+        while True:
+            positions, covers_grid = self._block(int(ix), int(iy), radius)
+            if len(positions):
+                ids = self._ids[positions]
+                keys = (self._xs[positions] - x) ** 2 + (self._ys[positions] - y) ** 2
+                if weights is not None:
+                    keys *= weights(ids)
+                limit = keys.min()
+                limit += abs_tol + rel_tol * limit
+                # Anything outside the block is at least radius cells away.
+                if covers_grid or (radius * self._cell_size) ** 2 > limit:
+                    shortlist = keys <= limit
+                    return ids[shortlist], keys[shortlist]
+            elif covers_grid:
+                return np.empty(0, dtype=np.intp), np.empty(0)
+            radius *= 2
+
+    def k_nearest(self, x, y, k):
+        """
+        Ids of the k remaining locations closest to (x, y), nearest
+        first (or all of them, if fewer than k remain).
+        """
+        k = min(k, self._n_alive)
+        if k == 0:
+            return np.empty(0, dtype=np.intp)
+
+        ix, iy = self._cell_xy(x, y)
+        radius = 1
+        while True:
+            positions, covers_grid = self._block(int(ix), int(iy), radius)
+            if len(positions) >= k:
+                squared = (self._xs[positions] - x) ** 2 + (self._ys[positions] - y) ** 2
+                closest = np.argpartition(squared, k - 1)[:k]
+                if covers_grid or (radius * self._cell_size) ** 2 >= squared[closest].max():
+                    closest = closest[np.argsort(squared[closest], kind="stable")]
+                    return self._ids[positions[closest]]
+            radius *= 2
@@ -84,6 +84,11 @@ try:
 except ValueError as e:
     print("Attempting to determine travel time to a location not in the country threw an error:")
     print(f"\t{e}")
+# Paths through locations outside the country can still be plotted
+import matplotlib.pyplot as plt
+
+for polar_projection in (True, False):
+    plt.close(skyrim.plot_path([riverwood, kvatch, riverwood], polar_projection=polar_projection))
 
 print(f"Using default args: {skyrim.fastest_trip_from(riverwood)}")
 print(f"Selecting settlements: {skyrim.fastest_trip_from(riverwood, [0, 1, 3, 4])}")
@@ -101,4 +106,697 @@ best_depot = skyrim.best_depot_site(display=False)
 print(f"\nThe best depot found was: {best_depot}")
 print("\nWith display=True however, we get information automatically...\n")
 best_depot_again = skyrim.best_depot_site()
-assert best_depot_again == best_depot
\ No newline at end of file
+assert best_depot_again == best_depot
+
+# Test: Travel time matrix
+matrix = skyrim.travel_time_matrix
+print(f"Travel time matrix shape: {matrix.shape}")
+assert matrix.shape == (len(skyrim._all_locations), len(skyrim._all_locations))
+for i, start in enumerate(skyrim._all_locations):
+    for j, end in enumerate(skyrim._all_locations):
+        expected = travel_time(
+            start.distance_to(end),
+            start.region != end.region,
+            len([loc for loc in skyrim._all_locations if loc.region == end.region]),
+        )
+        assert matrix[i, j] == expected, "Matrix entry differs from the scalar travel time"
+        assert skyrim.travel_time(start, end) == expected
+
+# Test: Cached settlements and depots follow depot flag changes
+settlements_before = skyrim.settlements
+assert skyrim.settlements is settlements_before, "Settlements should be cached between accesses"
+falkreath = next(loc for loc in skyrim.settlements if loc.name == "Falkreath")
+falkreath.depot = True
+assert falkreath in skyrim.depots and falkreath not in skyrim.settlements
+assert skyrim.n_depots == len(skyrim.depots) and skyrim.n_settlements == len(settlements_before) - 1
+falkreath.depot = False
+assert skyrim.settlements == settlements_before
+assert kvatch not in skyrim and riverwood in skyrim
+
+# Test: Nearest-neighbour tour engine agrees with the naive algorithm
+import random
+from contextlib import contextmanager
+import country as country_module
+from utilities import regular_n_gon
+
+
+def naive_nn_tour(country, depot):
+    def leg(start, end):
+        in_region = len([loc for loc in country._all_locations if loc.region == end.region])
+        return travel_time(start.distance_to(end), start.region != end.region, in_region)
+
+    tour, unvisited, total = [depot], list(country.settlements), 0
+    while unvisited:
+        nearest = min(unvisited, key=lambda loc: (leg(tour[-1], loc), loc.name, loc.region))
+        total += leg(tour[-1], nearest)
+        tour.append(nearest)
+        unvisited.remove(nearest)
+    total += leg(tour[-1], depot)
+    return tour + [depot], total
+
+
+def random_country(seed, n_locations, n_regions, n_depots):
+    rng = random.Random(seed)
+    return Country([
+        Location(
+            f"Site {i}",
+            f"Region {rng.randrange(n_regions)}",
+            rng.choice([rng.uniform(0, 1e5), 5e4]),
+            rng.choice([rng.uniform(-math.pi, math.pi), 0.0, math.pi / 2]),
+            i < n_depots,
+        )
+        for i in range(n_locations)
+    ])
+
+
+matrix_limit = country_module._MATRIX_MAX_LOCATIONS
+grid_threshold = country_module._SPATIAL_INDEX_MIN_SETTLEMENTS
+
+
+@contextmanager
+def tour_thresholds(matrix_max=matrix_limit, spatial_min=grid_threshold):
+    # Runs a block with other matrix and spatial index thresholds, and
+    # puts the defaults back even if it fails.
+    country_module._MATRIX_MAX_LOCATIONS = matrix_max
+    country_module._SPATIAL_INDEX_MIN_SETTLEMENTS = spatial_min
+    try:
+        yield
+    finally:
+        country_module._MATRIX_MAX_LOCATIONS = matrix_limit
+        country_module._SPATIAL_INDEX_MIN_SETTLEMENTS = grid_threshold
+
+
+# Full matrix, then row-by-row scanning, then the spatial grid index
+for limit, threshold in ((matrix_limit, grid_threshold), (0, grid_threshold), (0, 0)):
+    with tour_thresholds(limit, threshold):
+        test_countries = [regular_n_gon(n) for n in (0, 1, 2, 3, 27, 60)]
+        test_countries += [random_country(seed, 50, 1 + seed % 4, 2) for seed in range(5)]
+        for test_country in test_countries:
+            for depot in test_country.depots:
+                assert test_country.nn_tour(depot) == naive_nn_tour(test_country, depot), "NN tour differs"
+print("Nearest-neighbour tours match the naive algorithm")
+
+# Test: Depot tour times across a process pool
+import multiprocessing
+
+# This script runs its tests at module level, so worker processes are
+# forked: spawned ones would import it, and run every test again.
+if "fork" in multiprocessing.get_all_start_methods():
+    multiprocessing.set_start_method("fork", force=True)
+skyrim_tour_times = skyrim.depot_tour_times()
+print("Tour time from each depot:")
+for depot, depot_tour_time in sorted(skyrim_tour_times.items(), key=lambda item: item[1]):
+    print(f"\t{depot_tour_time:2.2f} h from {depot}")
+assert skyrim.depot_tour_times(workers=2) == skyrim_tour_times
+assert skyrim.best_depot_site(display=False, workers=2) == best_depot
+
+# Test: Chunked CSV loader
+from utilities import read_country_data_chunked
+
+skyrim_chunked = read_country_data_chunked(locations_csv_file, chunk_size=4)
+assert skyrim_chunked.n_settlements == skyrim.n_settlements and skyrim_chunked.n_depots == skyrim.n_depots
+assert skyrim_chunked.best_depot_site(display=False) == best_depot
+assert [str(loc) for loc in skyrim_chunked._all_locations] == [str(loc) for loc in skyrim._all_locations]
+print(f"Chunked loader read {len(skyrim_chunked._all_locations)} locations")
+lazy_skyrim = read_country_data_chunked(locations_csv_file, chunk_size=4)
+lazy_answer = lazy_skyrim.fastest_trip_from(lazy_skyrim.depots[0], [0, 3])
+assert lazy_skyrim._settlements is None, "fastest_trip_from should only build the Location it returns"
+assert str(lazy_answer[0]) == str(skyrim.fastest_trip_from(skyrim.depots[0], [0, 3])[0])
+
+# Test: Columnar Country hands out lightweight Location views
+import sys
+
+chunked_whiterun = next(loc for loc in skyrim_chunked.settlements if loc.name == "Whiterun")
+assert chunked_whiterun == whiterun and hash(chunked_whiterun) == hash(whiterun)
+assert str(chunked_whiterun) == str(next(loc for loc in skyrim.settlements if loc.name == "Whiterun"))
+assert not hasattr(chunked_whiterun, "__dict__"), "Location views should not carry an instance dict"
+assert isinstance(chunked_whiterun, Location)
+assert sys.getsizeof(chunked_whiterun) < sys.getsizeof(whiterun), "Views should not carry Location's data slots"
+chunked_whiterun.depot = True
+assert chunked_whiterun in skyrim_chunked.depots and skyrim_chunked.n_depots == skyrim.n_depots + 1
+chunked_whiterun.depot = False
+assert skyrim_chunked.n_depots == skyrim.n_depots
+
+# Test: Binary snapshots
+import tempfile
+from utilities import read_country_snapshot, write_country_snapshot
+
+with tempfile.TemporaryDirectory() as snapshot_dir:
+    snapshot_file = Path(snapshot_dir) / "skyrim.snapshot"
+    write_country_snapshot(skyrim, snapshot_file, include_matrix=True)
+    skyrim_snapshot = read_country_snapshot(snapshot_file)
+    assert [str(loc) for loc in skyrim_snapshot._all_locations] == [str(loc) for loc in skyrim._all_locations]
+    assert (skyrim_snapshot.travel_time_matrix == skyrim.travel_time_matrix).all()
+    assert skyrim_snapshot.depot_tour_times() == skyrim_tour_times
+    skyrim_snapshot.depots[0].depot = False
+    assert read_country_snapshot(snapshot_file).n_depots == skyrim.n_depots, "Snapshot file was modified"
+    del skyrim_snapshot
+print("Snapshot round trip preserved the Country")
+
+# Test: Tour improvement
+for test_country in [regular_n_gon(27)] + [random_country(seed, 80, 1 + seed % 4, 1) for seed in range(4)]:
+    depot = test_country.depots[0]
+    nn_tour_stops, nn_tour_time = test_country.nn_tour(depot)
+    assert test_country.improve_tour(nn_tour_stops, time_budget=0) == (nn_tour_stops, nn_tour_time)
+    improved_stops, improved_time = test_country.improve_tour(nn_tour_stops)
+    assert improved_stops[0] is depot and improved_stops[-1] is depot
+    assert sorted(improved_stops[1:-1]) == sorted(nn_tour_stops[1:-1])
+    legs_time = sum(test_country.travel_time(start, end) for start, end in zip(improved_stops, improved_stops[1:]))
+    assert improved_time <= nn_tour_time and math.isclose(improved_time, legs_time)
+improved_tour_times = skyrim.depot_tour_times(improve=True)
+assert all(improved_tour_times[depot] <= skyrim_tour_times[depot] for depot in skyrim_tour_times)
+assert skyrim.depot_tour_times(workers=2, improve=True) == improved_tour_times
+print(f"Improved tours save up to {max(skyrim_tour_times[d] - improved_tour_times[d] for d in skyrim_tour_times):.2f} h")
+
+# Test: Incremental edits match a Country rebuilt from scratch
+for seed in range(3):
+    edited = random_country(seed, 60, 3, 3)
+    edited_locations = list(edited._all_locations)
+    edited.travel_time_matrix
+    edited.depot_tour_times(incremental=True)
+    edits = [
+        lambda: edited.add_location(Location("Newtown", "Region 1", 2.5e4, 1.0, False)),
+        lambda: edited.remove_location(edited_locations[10]),
+        lambda: setattr(edited_locations[20], "depot", True),
+        lambda: setattr(edited_locations[0], "depot", False),
+        lambda: edited.add_location(Location("Outpost", "New Region", 7e4, -2.0, True)),
+    ]
+    for edit in edits:
+        edit()
+        rebuilt = Country([loc for loc in edited_locations if loc in edited] + [
+            loc for loc in edited._all_locations if loc not in edited_locations
+        ])
+        assert edited.depot_tour_times(incremental=True) == rebuilt.depot_tour_times()
+        assert (edited.travel_time_matrix == rebuilt.travel_time_matrix).all()
+        assert edited.best_depot_site(display=False, incremental=True) == rebuilt.best_depot_site(display=False)
+try:
+    skyrim_chunked.add_location(Location("Newtown", "Whiterun Hold", 1.0, 0.0, False))
+except TypeError:
+    pass
+else:
+    raise AssertionError("Columnar Countries should refuse edits")
+print("Incremental edits agree with rebuilt Countries")
+
+# Test: Batched travel times
+import numpy as np
+from country import travel_times
+
+trip_distances = np.array([0.0, 1234.5, 98765.4])
+assert (travel_times(trip_distances, [False, True, True], [3, 3, 7]) == [
+    travel_time(d, diff, n) for d, diff, n in zip(trip_distances, [False, True, True], [3, 3, 7])
+]).all()
+assert travel_times(trip_distances, True, 4, dtype=np.float32).dtype == np.float32
+assert (travel_times(trip_distances, [0., 1., 1.], 3) == [travel_time(d, diff, 3) for d, diff in zip(trip_distances, [0., 1., 1.])]).all()
+skyrim_ids = skyrim.location_ids(skyrim._all_locations)
+trip_block = skyrim.travel_times(skyrim_ids[:, np.newaxis], skyrim_ids)
+assert (trip_block == skyrim.travel_time_matrix).all()
+assert trip_block[3, 5] == skyrim.travel_time(skyrim._all_locations[3], skyrim._all_locations[5])
+trip_buffer = np.empty(len(skyrim_ids), dtype=np.float32)
+assert skyrim.travel_times(skyrim_ids[0], skyrim_ids, out=trip_buffer) is trip_buffer
+assert (trip_buffer == skyrim.travel_time_matrix[0].astype(np.float32)).all()
+print(f"Batched {trip_block.size} travel times")
+
+# Test: Multi-depot tours
+for n_tour_depots in (1, 3):
+    depot_tours, makespan = skyrim.multi_depot_tours(n_tour_depots)
+    assert len(depot_tours) == n_tour_depots
+    assert makespan == max(tour_time for _, tour_time in depot_tours.values())
+    assert sorted(loc for tour, _ in depot_tours.values() for loc in tour[1:-1]) == sorted(skyrim.settlements)
+    for depot, (tour, tour_time) in depot_tours.items():
+        assert tour[0] is depot and tour[-1] is depot
+        assert math.isclose(tour_time, sum(skyrim.travel_time(a, b) for a, b in zip(tour, tour[1:])))
+    parallel_tours, parallel_makespan = skyrim.multi_depot_tours(n_tour_depots, workers=2)
+    assert parallel_tours == depot_tours and parallel_makespan == makespan
+print(f"Three depots visit every settlement within {makespan:.2f} h")
+try:
+    skyrim.multi_depot_tours(skyrim.n_depots + 1)
+except ValueError:
+    pass
+else:
+    raise AssertionError("Asking for more depots than exist should fail")
+
+# Test: Hierarchical region-by-region tours
+hierarchical_countries = [skyrim, regular_n_gon(0), regular_n_gon(1), regular_n_gon(12), random_country(3, 80, 4, 2)]
+# More regions than each one's neighbour list
+hierarchical_countries.append(random_country(6, 300, 60, 1))
+for test_country in hierarchical_countries:
+    for depot in test_country.depots:
+        tour, tour_time = test_country.hierarchical_tour(depot)
+        assert tour[0] is depot and tour[-1] is depot
+        assert sorted(tour[1:-1]) == sorted(test_country.settlements)
+        assert math.isclose(tour_time, sum(test_country.travel_time(a, b) for a, b in zip(tour, tour[1:])), abs_tol=1e-12)
+assert skyrim.hierarchical_tour(best_depot, workers=2) == skyrim.hierarchical_tour(best_depot)
+print(f"Hierarchical tour from {best_depot.name} takes {skyrim.hierarchical_tour(best_depot)[1]:.2f} h")
+
+# Test: fastest_trip_from cache
+skyrim.fastest_trip_cache_clear()
+first_answer = skyrim.fastest_trip_from(whiterun, [0, 2, 5, 7])
+assert skyrim.fastest_trip_from(whiterun, [0, 2, 5, 7]) == first_answer
+assert skyrim.fastest_trip_from(whiterun, np.array([0, 2, 5, 7])) == first_answer
+cache_info = skyrim.fastest_trip_cache_info()
+assert (cache_info.hits, cache_info.misses) == (2, 1), cache_info
+for subset in ([1, 3], [4, 8, 9], list(range(12)), [6]):
+    # Later misses for the same origin are answered from its sorted neighbour list
+    uncached = min(
+        (skyrim.settlements[k] for k in subset),
+        key=lambda loc: (skyrim.travel_time(whiterun, loc), loc.name, loc.region),
+    )
+    assert skyrim.fastest_trip_from(whiterun, subset) == (uncached, skyrim.travel_time(whiterun, uncached))
+assert skyrim.fastest_trip_cache_info().sorted_origins == 1
+# Entries are keyed by a fixed-size fingerprint, not the candidate ids themselves
+skyrim.fastest_trip_from(whiterun)
+assert {len(fingerprint) for _, _, fingerprint in skyrim._trip_cache} == {16}
+# The same candidates in another order hit the same entry
+hits = skyrim.fastest_trip_cache_info().hits
+assert skyrim.fastest_trip_from(whiterun, [7, 5, 2, 0]) == first_answer
+assert skyrim.fastest_trip_cache_info().hits == hits + 1
+# Misses are only counted for as many origins as the cache holds
+country_module._TRIP_CACHE_SIZE, trip_cache_size = 2, country_module._TRIP_CACHE_SIZE
+for location in skyrim.settlements:
+    skyrim.fastest_trip_from(location, [0, 1])
+country_module._TRIP_CACHE_SIZE = trip_cache_size
+assert len(skyrim._sorted_neighbour_misses) == 2
+skyrim.fastest_trip_cache_clear()
+assert skyrim.fastest_trip_cache_info()[:2] == (0, 0)
+print(f"Fastest trip from Whiterun among four settlements: {first_answer[0].name}")
+
+# Test: Exact tours
+import warnings
+
+for depot in skyrim.depots:
+    optimal_tour, optimal_time = skyrim.optimal_tour(depot)
+    assert optimal_tour[0] is depot and optimal_tour[-1] is depot
+    assert sorted(optimal_tour[1:-1]) == sorted(skyrim.settlements)
+    assert optimal_time <= skyrim.nn_tour(depot)[1]
+    assert math.isclose(optimal_time, sum(skyrim.travel_time(a, b) for a, b in zip(optimal_tour, optimal_tour[1:])))
+    # Too little memory for Held-Karp: branch and bound must find a tour just as short
+    assert math.isclose(skyrim.optimal_tour(depot, memory_limit=0)[1], optimal_time)
+exact_times = skyrim.depot_tour_times(exact=True)
+assert skyrim.best_depot_site(display=False, exact=True) == min(exact_times, key=exact_times.get)
+small_country = random_country(4, 8, 2, 3)
+for depot in small_country.depots:
+    assert small_country.optimal_tour(depot)[1] <= small_country.nn_tour(depot)[1]
+try:
+    skyrim.depot_tour_times(exact=True, improve=True)
+except ValueError:
+    pass
+else:
+    raise AssertionError("Exact tours cannot also be improved")
+large_country = random_country(5, 60, 3, 1)
+try:
+    large_country.optimal_tour(large_country.depots[0], memory_limit=0)
+except ValueError:
+    pass
+else:
+    raise AssertionError("Branch and bound over 60 settlements needs a time budget")
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    budgeted_tour = large_country.optimal_tour(large_country.depots[0], memory_limit=0, time_budget=0.05)
+assert budgeted_tour[1] <= large_country.nn_tour(large_country.depots[0])[1]
+print(f"Optimal tour from {best_depot.name} takes {skyrim.optimal_tour(best_depot)[1]:.2f} h")
+
+# Test: Instrumentation
+assert skyrim.instrumentation_stats() is None
+instrumented_calls = []
+skyrim.enable_instrumentation(callback=lambda name, stats: instrumented_calls.append((name, stats)))
+assert skyrim.best_depot_site(display=False, improve=True) == best_depot
+instrumented_stats = skyrim.instrumentation_stats()
+assert [name for name, _ in instrumented_calls] == ["best_depot_site"]
+assert instrumented_calls[0][1] == instrumented_stats
+assert instrumented_stats["phases"]["tour_construction"]["calls"] == skyrim.n_depots
+assert instrumented_stats["phases"]["improvement"]["calls"] == skyrim.n_depots
+assert instrumented_stats["counters"]["travel_time"] > 0
+skyrim.travel_time(whiterun, skyrim.depots[0])
+assert instrumented_calls[-1][0] == "travel_time"
+assert instrumented_calls[-1][1]["counters"]["membership_check"] == 2
+assert skyrim.instrumentation_stats()["counters"]["membership_check"] == instrumented_stats["counters"]["membership_check"] + 2
+skyrim.disable_instrumentation()
+assert skyrim.instrumentation_stats() is None
+skyrim.travel_time(whiterun, skyrim.depots[0])
+assert len(instrumented_calls) == 2
+print(f"Instrumented best_depot_site computed {instrumented_stats['counters']['travel_time']} travel times")
+
+# Test: Asyncio front end
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import async_country
+from async_country import AsyncCountry, request, serve
+
+
+async def exercise_async_country():
+    service = AsyncCountry(skyrim)
+    depot = skyrim.depots[0]
+    # Identical queries in flight together are computed once
+    tours = await asyncio.gather(*(service.nn_tour(depot) for _ in range(4)))
+    assert service.n_computed == 1 and service.n_coalesced == 3
+    assert all(tour == skyrim.nn_tour(depot) for tour in tours)
+    assert await service.best_depot_site() == best_depot
+    assert await service.fastest_trip_from(whiterun, [0, 2, 5]) == skyrim.fastest_trip_from(whiterun, [0, 2, 5])
+    assert np.array_equal(await service.travel_times([0, 1], [2, 3]), skyrim.travel_times([0, 1], [2, 3]))
+    # A query that times out while waiting for the Country is never run,
+    # however many threads the executor has free
+    with ThreadPoolExecutor(4) as executor:
+        pooled_service, ran = AsyncCountry(skyrim, executor), []
+        outcomes = await asyncio.gather(
+            pooled_service._run(("slow",), None, time.sleep, 0.2),
+            pooled_service._run(("dropped",), 0.01, ran.append, "dropped"),
+            return_exceptions=True,
+        )
+    assert isinstance(outcomes[1], TimeoutError) and ran == []
+    try:
+        await service.best_depot_site(improve=True, timeout=0)
+    except TimeoutError:
+        pass
+    else:
+        raise AssertionError("A query past its timeout should raise TimeoutError")
+
+    server = await serve(skyrim)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        assert await request(port, "best_depot_site") == [best_depot.name, best_depot.region]
+        reply = await request(port, "nn_tour", depot=[depot.name, depot.region])
+        assert reply["time"] == skyrim.nn_tour(depot)[1]
+        try:
+            await request(port, "nn_tour", depot=["Nowhere", "Nowhere"])
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("The server should report unknown locations")
+        # Settlements may be named by index, as in Country.settlements
+        reply = await request(port, "fastest_trip_from", location=1, potential_locations=[0, 2])
+        assert reply["time"] == skyrim.fastest_trip_from(skyrim.settlements[1], [0, 2])[1]
+        # Clients cannot start worker processes
+        try:
+            await request(port, "best_depot_site", workers=8)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("The server should refuse the workers option")
+    assert async_country._server_options({"improve": True, "time_budget": 1e9, "memory_limit": 2**40}) == {
+        "improve": True,
+        "time_budget": async_country._SERVER_MAX_TIME_BUDGET,
+        "memory_limit": async_country._SERVER_MAX_MEMORY_LIMIT,
+    }
+
+asyncio.run(exercise_async_country())
+print("Async queries agree with the synchronous ones")
+
+# Test: Bulk Location construction
+bulk_columns = (
+    ["whiterun", "Riverwood", "Dragon  Bridge", "Riverwood"],
+    ["whiterun hold", "Whiterun Hold", "Haafingar", "The Rift"],
+    [1.5, 2, "3.25", 0.0],
+    [0.0, -math.pi, math.pi, 1],
+    [True, False, False, True],
+)
+with warnings.catch_warnings(record=True) as bulk_warnings:
+    warnings.simplefilter("always")
+    bulk_locations = Location.from_arrays(*bulk_columns)
+# One warning per distinct reformatted value, not per Location
+assert len(bulk_warnings) == 3
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    one_by_one = [Location(*row) for row in zip(*bulk_columns)]
+for bulk_location, location in zip(bulk_locations, one_by_one, strict=True):
+    for field in ("name", "region", "r", "theta", "depot"):
+        assert getattr(bulk_location, field) == getattr(location, field)
+        assert type(getattr(bulk_location, field)) is type(getattr(location, field))
+# Names and regions given as numpy string arrays are stored as plain str
+for bulk_location, location in zip(
+    Location.from_arrays(np.array(["Riverwood", "Falkreath"]), np.array(["Whiterun Hold", "Falkreath Hold"]),
+                         [1.0, 2.0], [0.0, 0.5], [False, True]),
+    [Location("Riverwood", "Whiterun Hold", 1.0, 0.0, False), Location("Falkreath", "Falkreath Hold", 2.0, 0.5, True)],
+    strict=True,
+):
+    assert type(bulk_location.name) is str and type(bulk_location.region) is str
+    assert (bulk_location.name, bulk_location.region) == (location.name, location.region)
+for bad_columns, error in [
+    ((["A", 1], ["B", "B"], [1, 1], [0, 0], [True, True]), TypeError),
+    ((["A", "A"], ["B", "B"], [1, "far"], [0, 0], [True, True]), TypeError),
+    ((["A", "A"], ["B", "B"], [1, 1], [0, 4], [True, True]), ValueError),
+    # The first invalid row decides the error, as it would one at a time
+    ((["A", "A"], ["B", "B"], [1, -1], [4, 0], [True, True]), ValueError),
+    ((["A", "A"], ["B", "B"], [1, 1], [0, 0], [True, 1]), TypeError),
+]:
+    try:
+        Location.from_arrays(*bad_columns)
+    except error as bulk_error:
+        try:
+            [Location(*row) for row in zip(*bad_columns)]
+        except error as single_error:
+            assert str(bulk_error) == str(single_error)
+    else:
+        raise AssertionError(f"{bad_columns} should raise {error.__name__}")
+bulk_country = Country.from_columns(
+    [location.name for location in skyrim._all_locations],
+    [location.region for location in skyrim._all_locations],
+    skyrim._r,
+    skyrim._theta,
+    [location.depot for location in skyrim._all_locations],
+)
+assert bulk_country._all_locations == skyrim._all_locations
+assert bulk_country.best_depot_site(display=False) == best_depot
+print(f"Bulk-built Country of {len(bulk_country._all_locations)} locations matches")
+
+# Test: One distance kernel for scalar and batched calls
+kernel_rng = random.Random(20)
+radii = []
+while len(radii) < 20:
+    # Radii whose pow()-based square is an ulp out, which the scalar and
+    # array paths used to disagree on
+    r = kernel_rng.uniform(0, 2e5)
+    if r**2 != r * r:
+        radii.append(r)
+kernel_country = Country([
+    Location(f"Place {i}", f"Region {i % 3}", r, kernel_rng.uniform(-math.pi, math.pi), i == 0)
+    for i, r in enumerate(radii)
+])
+kernel_locations = kernel_country._all_locations
+kernel_matrix = kernel_country.travel_time_matrix
+for i, start in enumerate(kernel_locations):
+    for j, end in enumerate(kernel_locations):
+        in_region = len([loc for loc in kernel_locations if loc.region == end.region])
+        assert kernel_matrix[i, j] == travel_time(start.distance_to(end), start.region != end.region, in_region)
+# Without a matrix, fastest_trip_from screens candidates with the cached Cartesian coordinates
+screened_country = random_country(21, 3000, 5, 2)
+screened_rng = np.random.default_rng(21)
+for origin in screened_country._all_locations[:20]:
+    subset = screened_rng.choice(screened_country.n_settlements, size=200, replace=False)
+    expected = min(
+        (screened_country.settlements[k] for k in subset),
+        key=lambda loc: (screened_country.travel_time(origin, loc), loc.name, loc.region),
+    )
+    assert screened_country.fastest_trip_from(origin, subset)[0] == expected
+assert screened_country._travel_time_matrix is None
+print("distance_to agrees with the batched travel times")
+
+# Test: Pruned best_depot_site gives the same depot as the full sweep
+pruning_locations = [skyrim._all_locations, regular_n_gon(30)._all_locations]
+pruning_locations += [random_country(22, 3000, 4, 6)._all_locations]
+pruning_locations += [random_country(seed, 60 + 10 * seed, 1 + seed % 4, 1 + seed % 7)._all_locations for seed in range(8)]
+# Depots with identical tours, where the tie goes to the first by name
+pruning_locations.append([
+    Location("Zeta", "North", 0, 0, True),
+    Location("Alpha", "North", 0, 0, True),
+    *(Location(f"Farm {i}", "South" if i % 2 else "North", 100 * i, 0.1 * i, False) for i in range(1, 20)),
+])
+pruning_locations.append([Location("Lonely", "Nowhere", 10, 0, True)])
+# Full matrix, then row-by-row scanning, then the spatial grid index
+for limit, threshold in ((matrix_limit, grid_threshold), (0, grid_threshold), (0, 0)):
+    with tour_thresholds(limit, threshold):
+        for locations in pruning_locations:
+            test_country = Country(list(locations))
+            expected = test_country.best_depot_site(display=False)
+            assert test_country.best_depot_site(display=False, prune=True) == expected, "Pruning changed the depot"
+try:
+    skyrim.best_depot_site(display=False, prune=True, improve=True)
+except ValueError:
+    pass
+else:
+    raise AssertionError("prune=True should not combine with improve")
+print(f"Pruned best_depot_site agrees on {len(pruning_locations)} countries")
+
+# Test: Tiled, disk-backed travel-time store
+from travel_time_store import TiledTravelTimes
+
+store_rng = np.random.default_rng(22)
+dense = store_rng.random((300, 300))
+store = TiledTravelTimes(
+    300, lambda start_ids, end_ids: dense[np.ix_(start_ids, end_ids)], tile_size=32,
+    memory_limit=4 * 32 * 32 * 8, order=store_rng.permutation(300),
+)
+some_ids = store_rng.integers(0, 300, 40)
+for key in [(7, some_ids), (some_ids, 7), (some_ids[:, None], some_ids), np.ix_(some_ids, some_ids),
+            (some_ids, some_ids[::-1]), (7, slice(None)), (slice(None), 7), (some_ids, slice(None)), (3, 5)]:
+    assert np.array_equal(store[key], dense[key]) and np.shape(store[key]) == np.shape(dense[key])
+assert store.item(299, 0) == dense[299, 0]
+assert store.cache_info().spilled > 0 and store.cache_info().currsize <= 4 * 32 * 32 * 8
+store.close()
+# Reading a whole row keeps no more tiles in memory than the limit allows
+import tracemalloc
+
+banded = TiledTravelTimes(
+    3000, lambda start_ids, end_ids: np.add.outer(start_ids, end_ids).astype(float), tile_size=64,
+    memory_limit=4 * 64 * 64 * 8,
+)
+tracemalloc.start()
+assert np.array_equal(banded[5, :], 5 + np.arange(3000.0))
+# The limit, a few tiles being computed and a few index arrays the length
+# of the row: far less than the 47 tiles the row spans
+assert tracemalloc.get_traced_memory()[1] < (4 + 4) * 64 * 64 * 8 + 8 * 3000 * 8
+tracemalloc.stop()
+banded.close()
+capped = TiledTravelTimes(
+    300, lambda start_ids, end_ids: dense[np.ix_(start_ids, end_ids)], tile_size=32,
+    memory_limit=32 * 32 * 8, disk_limit=3 * 32 * 32 * 8,
+)
+assert np.array_equal(capped[some_ids[:, None], some_ids], dense[np.ix_(some_ids, some_ids)])
+assert np.array_equal(capped[some_ids[:, None], some_ids], dense[np.ix_(some_ids, some_ids)])
+assert capped.cache_info().spilled == 3 and len(capped._spill) == 3
+capped.close()
+
+store_locations = random_country(23, 600, 3, 3)._all_locations
+dense_country = Country(list(store_locations))
+with tour_thresholds(matrix_max=0):
+    tiled_country = Country(list(store_locations))
+    tiled_country.enable_travel_time_store(memory_limit=8 * 64 * 64 * 8, tile_size=64)
+    for test_country in (dense_country, tiled_country):
+        test_country.add_location(Location("Newcomer", "Region 1", 123.0, 0.5, False))
+    for depot in dense_country.depots:
+        assert tiled_country.nn_tour(depot) == dense_country.nn_tour(depot)
+    for origin in dense_country._all_locations[:20]:
+        assert tiled_country.fastest_trip_from(origin) == dense_country.fastest_trip_from(origin)
+    all_ids = np.arange(len(store_locations) + 1)
+    assert np.array_equal(tiled_country.travel_times(all_ids[:, None], all_ids), dense_country.travel_time_matrix)
+    assert tiled_country.best_depot_site(display=False) == dense_country.best_depot_site(display=False)
+    assert tiled_country.travel_time_store_info().spilled > 0
+    # A store too small to hold whole rows times the candidates around each
+    # stop, so a tour only computes the tiles along its way
+    tiled_country.enable_travel_time_store(memory_limit=8 * 64 * 64 * 8, tile_size=64)
+    assert tiled_country.nn_tour(dense_country.depots[0]) == dense_country.nn_tour(dense_country.depots[0])
+    tour_tiles = tiled_country.travel_time_store_info()
+    assert tour_tiles.hits > tour_tiles.misses and tour_tiles.misses < 10 * 10
+    for origin in dense_country._all_locations[20:40]:
+        assert tiled_country.fastest_trip_from(origin) == dense_country.fastest_trip_from(origin)
+    assert tiled_country.improve_tour(dense_country.nn_tour(dense_country.depots[0])[0]) == \
+        dense_country.improve_tour(dense_country.nn_tour(dense_country.depots[0])[0])
+    # One that holds every tile is read a row at a time, like the dense matrix
+    tiled_country.enable_travel_time_store(memory_limit=601 * 601 * 8, tile_size=64)
+    assert tiled_country.best_depot_site(display=False) == dense_country.best_depot_site(display=False)
+    assert tiled_country.travel_time_store_info().misses == 10 * 10
+    tiled_country.disable_travel_time_store()
+    assert tiled_country.travel_time_store_info() is None
+print(f"Tiled travel times match the dense matrix for {len(all_ids)} locations")
+
+# Test: Streaming tours leg by leg
+for test_country in [skyrim, regular_n_gon(12), random_country(24, 80, 3, 2), Country([Location("Solo", "A", 1, 0, True)])]:
+    for depot in test_country.depots:
+        tour, tour_time = test_country.nn_tour(depot)
+        streamed = list(test_country.iter_nn_tour(depot))
+        assert [location for location, _, _ in streamed] == tour
+        assert streamed[-1][2] == tour_time
+        running_time = 0
+        for start, (end, leg_time, cumulative_time) in zip(tour, streamed[1:]):
+            running_time += leg_time
+            assert leg_time == test_country.travel_time(start, end) and cumulative_time == running_time
+        path_steps = list(test_country.iter_nearest_neighbour_path(depot))
+        assert [location for location, _, _ in path_steps] == test_country.nearest_neighbour_path(depot)
+        assert path_steps[0] == (depot, 0.0, 0.0)
+# Only the legs asked for are computed
+with tour_thresholds(matrix_max=0):
+    streamed_country = random_country(25, 200, 2, 1)
+    streamed_country.enable_instrumentation()
+    first_legs = streamed_country.iter_nn_tour(streamed_country.depots[0])
+    next(first_legs), next(first_legs)
+    first_legs.close()
+    partial_count = streamed_country.instrumentation_stats()["counters"]["distance_to"]
+    streamed_country.enable_instrumentation()
+    streamed_country.nn_tour(streamed_country.depots[0])
+    assert 0 < partial_count < streamed_country.instrumentation_stats()["counters"]["distance_to"]
+try:
+    skyrim.iter_nn_tour(skyrim.settlements[0])
+except ValueError:
+    pass
+else:
+    raise AssertionError("iter_nn_tour should check its depot straight away")
+print("Streamed tours match nn_tour and nearest_neighbour_path")
+
+# Test: nn_tour and nearest_neighbour_path share one kernel (property checks over random countries)
+
+
+def naive_nearest_neighbour_path(country, depot):
+    # The original nearest_neighbour_path: ties go to the first settlement.
+    path, unvisited = [depot], list(country.settlements)
+    while unvisited:
+        nearest = min(unvisited, key=lambda loc: country.travel_time(path[-1], loc))
+        path.append(nearest)
+        unvisited.remove(nearest)
+    return path + [depot]
+
+
+property_rng = random.Random(24)
+property_countries = [regular_n_gon(n) for n in (0, 1, 4, 19, 40)]
+for _ in range(12):
+    property_countries.append(random_country(
+        property_rng.randrange(10**6), property_rng.randrange(1, 70), property_rng.randrange(1, 6),
+        property_rng.randrange(1, 4),
+    ))
+for limit, threshold in ((matrix_limit, grid_threshold), (0, grid_threshold), (0, 0)):
+    with tour_thresholds(limit, threshold):
+        for test_country in property_countries:
+            test_country = Country(list(test_country._all_locations))
+            for depot in test_country.depots:
+                tour, tour_time = test_country.nn_tour(depot)
+                assert (tour, tour_time) == naive_nn_tour(test_country, depot)
+                assert test_country.nearest_neighbour_path(depot) == tour
+                assert test_country.nearest_neighbour_path(depot, "position") == naive_nearest_neighbour_path(test_country, depot)
+                compensated_tour, compensated_time = test_country.nn_tour(depot, accumulate="compensated")
+                legs = [test_country.travel_time(start, end) for start, end in zip(tour, tour[1:])]
+                assert compensated_tour == tour and abs(compensated_time - math.fsum(legs)) <= 1e-15 * tour_time
+                assert [step[0] for step in test_country.iter_nearest_neighbour_path(depot, "position")] == \
+                    test_country.nearest_neighbour_path(depot, "position")
+try:
+    skyrim.nn_tour(skyrim.depots[0], tie_break="random")
+except ValueError:
+    pass
+else:
+    raise AssertionError("Unknown tie_break should raise ValueError")
+print(f"One tour kernel agrees with the naive algorithms on {len(property_countries)} countries")
+
+# Test: float32 travel-time precision gives exactly the float64 results
+precision_countries = [regular_n_gon(n) for n in (12, 60)] + [random_country(25 + seed, 150, 4, 3) for seed in range(4)]
+for limit, store in ((matrix_limit, False), (0, True), (0, False)):
+    with tour_thresholds(limit):
+        for test_country in precision_countries:
+            exact_country = Country(list(test_country._all_locations))
+            single_country = Country(list(test_country._all_locations))
+            single_country.set_travel_time_precision(np.float32)
+            if store:
+                single_country.enable_travel_time_store(memory_limit=4 * 32 * 32 * 4, tile_size=32)
+            single_country.add_location(Location("Newcomer", "Region 1", 123.0, 0.5, False))
+            exact_country.add_location(Location("Newcomer", "Region 1", 123.0, 0.5, False))
+            for depot in exact_country.depots:
+                assert single_country.nn_tour(depot) == exact_country.nn_tour(depot)
+                tour, _ = exact_country.nn_tour(depot)
+                assert single_country.improve_tour(tour) == exact_country.improve_tour(tour)
+            for origin in exact_country._all_locations[::5]:
+                assert single_country.fastest_trip_from(origin) == exact_country.fastest_trip_from(origin)
+            assert single_country.best_depot_site(display=False) == exact_country.best_depot_site(display=False)
+            assert single_country.best_depot_site(display=False, prune=True) == exact_country.best_depot_site(display=False)
+            some_ids = np.arange(len(exact_country._all_locations))[::7]
+            assert np.array_equal(single_country.travel_times(some_ids[:, None], some_ids),
+                                  exact_country.travel_times(some_ids[:, None], some_ids))
+            assert np.array_equal(single_country.travel_times(some_ids[:, None], some_ids, np.float32),
+                                  exact_country.travel_times(some_ids[:, None], some_ids, np.float32))
+single_country.set_travel_time_precision(np.float32)
+assert single_country.travel_time_matrix.dtype == np.float32
+assert single_country.travel_time_matrix.nbytes * 2 == exact_country.travel_time_matrix.nbytes
+try:
+    single_country.set_travel_time_precision(np.float16)
+except ValueError:
+    pass
+else:
+    raise AssertionError("Only float64 and float32 travel times should be allowed")
+print(f"float32 travel times give the float64 results on {len(precision_countries)} countries")
@@ -0,0 +1,179 @@
+"""
+Local search that improves a closed tour, such as the one produced by
+Country.nn_tour, with 2-opt and Or-opt moves.
+
+Travel times are asymmetric (the region penalty depends on the
+destination), so every move is scored with the time of each leg in the
+direction it is actually travelled, including the legs of any segment
+that gets reversed.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+
+import numpy as np
+
+# Moves must save more than this to be applied, so that rounding noise
+# cannot make the search cycle between equivalent tours.
+_MIN_IMPROVEMENT = 1e-10
+
+
+def improve_tour(tour, leg_time, neighbours, time_budget=None, max_segment=3, leg_times=None):
+    """
+    Improves a closed tour with 2-opt and Or-opt moves.
+
+    Only moves that create a leg from a location to one of its
+    neighbours are tried, and "don't-look bits" skip locations whose
+    surroundings have not changed since they last failed to improve.
+
+    Parameters
+    ----------
+    tour : list of int
+        Location ids, starting with the depot, which stays first. The
+        return leg to the depot is implied.
+    leg_time : callable
+        leg_time(i, j) is the travel time from location i to location j.
+    neighbours : dict or list
+        neighbours[i] is a sequence of the ids of the locations closest
+        to location i, which are the candidate new legs out of i.
+    time_budget : float, optional
+        Seconds after which the search stops, even if it could still
+        improve the tour. By default it runs to a local optimum.
+    max_segment : int, default: 3
+        Longest segment that Or-opt moves to another place in the tour.
+    leg_times : callable, optional
+        A vectorised leg_time, taking and returning arrays, used to
+        re-time the whole tour after each move. Worth passing for long
+        tours.
+
+    Returns
+    -------
+    list of int
+        The improved tour, still starting with the depot.
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    tour = list(tour)
+    n_stops = len(tour)
+    if n_stops < 4:
+        return tour
+
+    position = {location: k for k, location in enumerate(tour)}
+    legs = np.zeros((2, n_stops))
+    _retime_legs(tour, legs, 0, n_stops - 1, leg_time, leg_times)
+    forward, backward = _prefix_times(legs)
+    active = deque(tour)
+    queued = set(tour)
+
+    while active:
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        location = active.popleft()
+        queued.discard(location)
+
+        move = _best_two_opt(tour, position, forward, backward, leg_time, neighbours, location)
+        if move is None:
+            move = _best_or_opt(tour, position, leg_time, neighbours, location, max_segment)
+        if move is None:
+            continue
+
+        tour, touched, (first, last) = move
+        for k in range(first, last + 1):
+            position[tour[k]] = k
+        _retime_legs(tour, legs, first - 1, last, leg_time, leg_times)
+        forward, backward = _prefix_times(legs)
+        for location in touched:
+            if location not in queued:
+                active.append(location)
+                queued.add(location)
+
+    return tour
+
+
+def _retime_legs(tour, legs, first, last, leg_time, leg_times=None):
+    # legs[0, k] is the time from tour[k] to the stop after it, and
+    # legs[1, k] the time of the same leg travelled the other way.
+    n_stops = len(tour)
+    if leg_times is not None:
+        stops = np.asarray(tour[first:last + 1])
+        after = np.asarray(tour[first + 1:last + 2] + tour[:max(last + 2 - n_stops, 0)])
+        legs[0, first:last + 1] = leg_times(stops, after)
+        legs[1, first:last + 1] = leg_times(after, stops)
+        return
+    for k in range(first, last + 1):
+        after = tour[(k + 1) % n_stops]
+        legs[0, k] = leg_time(tour[k], after)
+        legs[1, k] = leg_time(after, tour[k])
+
+
+def _prefix_times(legs):
+    # forward[k] is the time to travel tour[0] -> ... -> tour[k], and
+    # backward[k] the time for the same legs travelled the other way.
+    prefix = np.zeros((2, legs.shape[1] + 1))
+    np.cumsum(legs, axis=1, out=prefix[:, 1:])
+    return prefix[0], prefix[1]
+
+
+def _best_two_opt(tour, position, forward, backward, leg_time, neighbours, location):
+    # Replace legs p -> q and r -> s with p -> r and q -> s, reversing
+    # q ... r. The location is tried both as p (new leg out of it) and as
+    # r (new leg into it).
+    n_stops = len(tour)
+    best_delta, best = -_MIN_IMPROVEMENT, None
+
+    for neighbour in neighbours[location]:
+        for i, j in ((position[location], position[neighbour]), (position[neighbour], position[location])):
+            if not 0 <= i < j - 1:
+                continue
+            p, q, r, s = tour[i], tour[i + 1], tour[j], tour[(j + 1) % n_stops]
+            reversal = (backward[j] - backward[i + 1]) - (forward[j] - forward[i + 1])
+            delta = (
+                leg_time(p, r) + leg_time(q, s) - leg_time(p, q) - leg_time(r, s) + reversal
+            )
+            if delta < best_delta:
+                best_delta, best = delta, (i, j)
+
+    if best is None:
+        return None
+    i, j = best
+    new_tour = tour[:i + 1] + tour[j:i:-1] + tour[j + 1:]
+    return new_tour, {tour[i], tour[i + 1], tour[j], tour[(j + 1) % n_stops]}, (i + 1, j)
+
+
+def _best_or_opt(tour, position, leg_time, neighbours, location, max_segment):
+    # Move a segment of up to max_segment stops that starts at the
+    # location to between one of its neighbours and the stop after it,
+    # keeping the segment's direction. The depot never moves.
+    n_stops = len(tour)
+    start = position[location]
+    if start == 0:
+        return None
+    best_delta, best = -_MIN_IMPROVEMENT, None
+
+    for length in range(1, max_segment + 1):
+        end = start + length - 1
+        if end >= n_stops:
+            break
+        before, after = tour[start - 1], tour[(end + 1) % n_stops]
+        first, last = tour[start], tour[end]
+        removal = leg_time(before, after) - leg_time(before, first) - leg_time(last, after)
+
+        for neighbour in neighbours[location]:
+            k = position[neighbour]
+            if start - 1 <= k <= end:
+                continue
+            following = tour[(k + 1) % n_stops]
+            delta = removal + leg_time(neighbour, first) + leg_time(last, following) - leg_time(neighbour, following)
+            if delta < best_delta:
+                best_delta, best = delta, (end, k)
+
+    if best is None:
+        return None
+    end, k = best
+    segment = tour[start:end + 1]
+    rest = tour[:start] + tour[end + 1:]
+    insert_at = rest.index(tour[k]) + 1
+    new_tour = rest[:insert_at] + segment + rest[insert_at:]
+    touched = {tour[start - 1], tour[(end + 1) % n_stops], tour[k], tour[(k + 1) % n_stops], *segment}
+    return new_tour, touched, (min(start, k + 1), max(end, k))
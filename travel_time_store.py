@@ -0,0 +1,253 @@
+"""
+An out-of-core travel-time matrix for Countries too large to hold every
+pair of travel times in memory: square tiles of the matrix are computed
+on demand, the most recently used are kept in memory up to a byte limit,
+and the rest are spilled to a memory-mapped scratch file, from which
+they are read back rather than recomputed.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+
+class TileCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    reloads: int
+    spilled: int
+    currsize: int
+    maxsize: int
+
+
+class TiledTravelTimes:
+    """
+    Travel times between every pair of n_locations locations, indexed like
+    the dense N x N matrix: store[i, j], store[i, ids], store[ids, j],
+    store[ids[:, None], other_ids] and store.item(i, j) all work as they
+    would on an ndarray, and give exactly the same values (in dtype).
+
+    Tiles cover tile_size x tile_size consecutive locations in layout
+    order, so passing an order that keeps nearby locations together means
+    a tour's successive rows mostly come from the same tiles.
+
+    Parameters
+    ----------
+    n_locations : int
+    compute_block : callable
+        compute_block(start_ids, end_ids) returns the
+        (len(start_ids), len(end_ids)) block of travel times.
+    tile_size : int, default: 512
+    memory_limit : int, default: 256 MiB
+        Bytes of tiles kept in memory; at least one tile is always kept.
+    order : array of int, optional
+        Location ids in layout order. By default, id order.
+    scratch_dir : str or Path, optional
+        Where to create the scratch file (by default, the system's
+        temporary directory). It is deleted when the store is closed or
+        garbage collected.
+    dtype : numpy dtype, default: numpy.float64
+        Type the tiles are kept in; computed blocks are rounded to it.
+    disk_limit : int, optional
+        Bytes the scratch file may grow to (by default, no limit). Tiles
+        evicted once it is full are dropped, and recomputed if needed.
+    """
+
+    def __init__(
+        self,
+        n_locations,
+        compute_block,
+        tile_size=512,
+        memory_limit=256 * 2**20,
+        order=None,
+        scratch_dir=None,
+        dtype=np.float64,
+        disk_limit=None,
+    ):
+        if tile_size < 1:
+            raise ValueError(f"tile_size must be at least 1, not {tile_size}.")
+        self.shape = (n_locations, n_locations)
+        self.dtype = np.dtype(dtype)
+        self.tile_size = tile_size
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self._compute_block = compute_block
+        self._n_tiles = -(-n_locations // tile_size)
+
+        self._order = np.arange(n_locations) if order is None else np.asarray(order, dtype=np.intp)
+        self._position = np.empty(n_locations, dtype=np.intp)
+        self._position[self._order] = np.arange(n_locations)
+
+        self._tiles = OrderedDict()
+        self._n_bytes = 0
+        self._slots = {}
+        self._scratch_dir = scratch_dir
+        self._file = None
+        self._spill = None
+        self._hits = self._misses = self._reloads = 0
+
+    @property
+    def ndim(self):
+        return 2
+
+    @property
+    def fits_in_memory(self):
+        """Whether every tile can be kept in memory at once."""
+        return self.shape[0] ** 2 * self.dtype.itemsize <= self.memory_limit
+
+    def __len__(self):
+        return self.shape[0]
+
+    def cache_info(self) -> TileCacheInfo:
+        """
+        Tiles found in memory (hits), computed (misses) and read back from
+        the scratch file (reloads), tiles spilled to it, and bytes of tiles
+        in memory against the limit.
+        """
+        return TileCacheInfo(
+            self._hits, self._misses, self._reloads, len(self._slots), self._n_bytes, self.memory_limit
+        )
+
+    def close(self):
+        """Drops every tile and deletes the scratch file."""
+        self._tiles.clear()
+        self._n_bytes = 0
+        self._slots.clear()
+        self._spill = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _tile(self, tile_row, tile_column):
+        key = tile_row * self._n_tiles + tile_column
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+            self._hits += 1
+            return tile
+
+        size = self.tile_size
+        rows = self._order[tile_row * size:(tile_row + 1) * size]
+        columns = self._order[tile_column * size:(tile_column + 1) * size]
+        slot = self._slots.get(key)
+        if slot is not None:
+            # A view of the scratch file, read through the page cache.
+            tile = self._spill[slot, :len(rows), :len(columns)]
+            self._reloads += 1
+        else:
+            tile = self._compute_block(rows, columns).astype(self.dtype, copy=False)
+            self._misses += 1
+
+        self._tiles[key] = tile
+        self._n_bytes += tile.nbytes
+        while self._n_bytes > self.memory_limit and len(self._tiles) > 1:
+            self._evict()
+        return tile
+
+    def _evict(self):
+        key, tile = self._tiles.popitem(last=False)
+        self._n_bytes -= tile.nbytes
+        if key in self._slots:
+            # Tiles never change, so the copy on disk is still good.
+            return
+        slot = len(self._slots)
+        if self._spill is None or slot == len(self._spill):
+            n_slots = max(2 * slot, 16)
+            if self.disk_limit is not None:
+                n_slots = min(n_slots, self.disk_limit // (self.tile_size**2 * self.dtype.itemsize))
+            if n_slots <= slot:
+                return
+            self._grow_scratch(n_slots)
+        rows, columns = tile.shape
+        self._spill[slot, :rows, :columns] = tile
+        self._slots[key] = slot
+
+    def _grow_scratch(self, n_slots):
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(dir=self._scratch_dir, prefix="travel_times_")
+        shape = (n_slots, self.tile_size, self.tile_size)
+        self._file.truncate(int(np.prod(shape)) * self.dtype.itemsize)
+        self._spill = np.memmap(self._file, dtype=self.dtype, mode="r+", shape=shape)
+
+    def _gather(self, row_positions, column_positions):
+        # Every tile that is needed is fetched once, and its entries taken
+        # before the next is fetched, so only one has to fit in memory.
+        size = self.tile_size
+        keys = (row_positions // size) * self._n_tiles + column_positions // size
+        out = np.empty(keys.shape, dtype=self.dtype)
+        by_tile = np.argsort(keys, kind="stable")
+        sorted_keys = keys[by_tile]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        for start, stop in zip(starts.tolist(), [*starts[1:].tolist(), len(keys)]):
+            members = by_tile[start:stop]
+            tile_row, tile_column = divmod(int(sorted_keys[start]), self._n_tiles)
+            tile = self._tile(tile_row, tile_column)
+            out[members] = tile[row_positions[members] % size, column_positions[members] % size]
+        return out
+
+    def _positions(self, ids):
+        if isinstance(ids, slice):
+            ids = np.arange(self.shape[0])[ids]
+        return self._position[ids]
+
+    def _line(self, position, axis, positions):
+        # Entries of one row (axis 0) or column (axis 1), fetched tile by
+        # tile from those of its band that positions fall in. Each tile's
+        # part is copied out before the next is fetched, so only one tile
+        # has to fit in memory.
+        size = self.tile_size
+        tile, offset = divmod(int(position), size)
+
+        def part(other):
+            return self._tile(tile, other)[offset] if axis == 0 else self._tile(other, tile)[:, offset]
+
+        others = positions // size
+        if len(positions) and others.min() == others.max():
+            # Typically a few candidates near one location, all in one tile
+            return part(int(others[0]))[positions % size]
+        line = np.empty(len(positions), dtype=self.dtype)
+        by_tile = np.argsort(others, kind="stable")
+        sorted_others = others[by_tile]
+        starts = np.flatnonzero(sorted_others[1:] != sorted_others[:-1]) + 1
+        for start, stop in zip([0, *starts.tolist()], [*starts.tolist(), len(positions)]):
+            if start < stop:
+                members = by_tile[start:stop]
+                line[members] = part(int(sorted_others[start]))[positions[members] % size]
+        return line
+
+    def __getitem__(self, key):
+        start_ids, end_ids = key
+        rows, columns = self._positions(start_ids), self._positions(end_ids)
+        # Entries of one row or column are cut straight from its tiles,
+        # which is cheaper than the general gather.
+        if np.ndim(rows) == 0 and np.ndim(columns) == 1:
+            return self._line(rows, 0, columns)
+        if np.ndim(columns) == 0 and np.ndim(rows) == 1:
+            return self._line(columns, 1, rows)
+        if isinstance(start_ids, slice) or isinstance(end_ids, slice):
+            # As for an ndarray, a slice keeps its axis: store[i, :] is a
+            # row and store[ids, :] a block.
+            shape = tuple(len(positions) for positions in (rows, columns) if np.ndim(positions))
+            rows, columns = np.ix_(np.atleast_1d(rows), np.atleast_1d(columns))
+        rows, columns = np.broadcast_arrays(rows, columns)
+        if not isinstance(start_ids, slice) and not isinstance(end_ids, slice):
+            shape = rows.shape
+        times = self._gather(rows.ravel(), columns.ravel())
+        return times.reshape(shape) if shape else times[0]
+
+    def item(self, start_id, end_id):
+        size = self.tile_size
+        row, column = self._position[start_id], self._position[end_id]
+        return float(self._tile(row // size, column // size)[row % size, column % size])
+
+    def row(self, start_id, end_ids=None):
+        """Times from start_id to each of end_ids (by default, every location)."""
+        return self[start_id, slice(None) if end_ids is None else end_ids]
+
+    def column(self, end_id, start_ids=None):
+        """Times to end_id from each of start_ids (by default, every location)."""
+        return self[slice(None) if start_ids is None else start_ids, end_id]
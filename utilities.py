@@ -1,16 +1,21 @@
 from __future__ import annotations
 
+import itertools
+import json
 import string
+import struct
+import warnings
+from typing import Any, Dict
 
 import numpy as np
 
-from country import Country, Location
+from country import _FORMATTED_WORDS, Country, Location, _NamesTable, _capitalize_words
 import csv
 from pathlib import Path
 
 
 def read_country_data(file_path: Path) -> Country:
-    locations = []
+    columns = {"name": [], "region": [], "r": [], "theta": [], "depot": []}
 
     with file_path.open('r') as file:
         reader = csv.DictReader(file)
@@ -23,10 +28,260 @@ def read_country_data(file_path: Path) -> Country:
             depot = row.get("depot").strip().lower() == 'true'
 
             if name and region:
-                location = Location(name=name, region=region, r=r, theta=theta, depot=depot)
-                locations.append(location)
+                columns["name"].append(name)
+                columns["region"].append(region)
+                columns["r"].append(r)
+                columns["theta"].append(theta)
+                columns["depot"].append(depot)
 
-    return Country(locations)
+    # Validated column by column, as Location would validate each row
+    return Country.from_columns(columns["name"], columns["region"], columns["r"], columns["theta"], columns["depot"])
+
+
+def read_location_columns(file_path: Path, chunk_size: int = 100_000, errors: str = "raise") -> Dict[str, Any]:
+    """
+    Reads a locations CSV file straight into columns, parsing and
+    validating chunk_size rows at a time instead of building a Location
+    per row.
+
+    Rows are formatted and validated exactly as Location would, but the
+    problems are reported once for the whole file: names or regions that
+    had to be reformatted produce a single warning each, and rows with an
+    unreadable or out-of-range r or theta are collected together. Rows
+    without a name or region are skipped, as in read_country_data.
+
+    Parameters
+    ----------
+    file_path : Path
+        CSV file with location, r, theta, region and depot columns.
+    chunk_size : int, default: 100_000
+        Number of rows parsed at a time.
+    errors : {"raise", "skip"}, default: "raise"
+        Whether invalid rows raise a single ValueError listing them, or
+        are dropped with a single warning.
+
+    Returns
+    -------
+    dict
+        "name" and "region" lists of str, "r" and "theta" float arrays
+        and a "depot" bool array, one entry per valid row.
+    """
+    if errors not in ("raise", "skip"):
+        raise ValueError("The 'errors' value must be 'raise' or 'skip'.")
+
+    reformatted = {"name": {}, "region": {}}
+
+    def format_column(values, column):
+        # Most values are already formatted; only the ones the pattern
+        # cannot vouch for go through the exact reformatting.
+        values = list(values)
+        for i, match in enumerate(map(_FORMATTED_WORDS.fullmatch, values)):
+            if match is None:
+                formatted = _capitalize_words(values[i])
+                if formatted != values[i]:
+                    reformatted[column][values[i]] = formatted
+                    values[i] = formatted
+        return values
+
+    columns = {"name": [], "region": [], "r": [], "theta": [], "depot": []}
+    bad_rows = []
+    rows_read = 0
+
+    with file_path.open('r', newline='') as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        positions = [header.index(column) for column in ("location", "r", "theta", "region", "depot")]
+        width = len(header)
+
+        for chunk in iter(lambda: list(itertools.islice(reader, chunk_size)), []):
+            if len(set(map(len, chunk))) != 1 or len(chunk[0]) != width:
+                chunk = [(row + [""] * width)[:width] for row in chunk]
+            by_column = list(zip(*chunk))
+            names, r, theta, regions, depots = (by_column[position] for position in positions)
+            rows = np.arange(rows_read + 1, rows_read + len(chunk) + 1)
+            rows_read += len(chunk)
+
+            keep = np.fromiter(map(bool, names), dtype=bool, count=len(chunk))
+            keep &= np.fromiter(map(bool, regions), dtype=bool, count=len(chunk))
+            r, r_ok = _parse_floats(r)
+            theta, theta_ok = _parse_floats(theta)
+            valid = r_ok & theta_ok & ~(r < 0) & (theta >= -np.pi) & (theta <= np.pi)
+            bad_rows.extend(rows[keep & ~valid].tolist())
+            keep &= valid
+
+            depot_flags = {value: value.strip().lower() == 'true' for value in set(depots)}
+            depot = np.fromiter(map(depot_flags.__getitem__, depots), dtype=bool, count=len(chunk))
+
+            kept = np.flatnonzero(keep)
+            columns["name"].extend(format_column(map(names.__getitem__, kept), "name"))
+            columns["region"].extend(format_column(map(regions.__getitem__, kept), "region"))
+            columns["r"].append(r[keep])
+            columns["theta"].append(theta[keep])
+            columns["depot"].append(depot[keep])
+
+    if bad_rows:
+        message = (
+            f"{len(bad_rows)} rows have an 'r' value that is not a non-negative number, or a "
+            f"'theta' value outside -π ≤ θ ≤ π (rows {', '.join(map(str, bad_rows[:10]))}"
+            f"{', ...' if len(bad_rows) > 10 else ''})."
+        )
+        if errors == "raise":
+            raise ValueError(message)
+        warnings.warn(f"Skipped: {message}")
+
+    for column, changes in reformatted.items():
+        if changes:
+            original, formatted = next(iter(changes.items()))
+            warnings.warn(
+                f"{len(changes)} '{column}' values were reformatted, e.g. '{original}' to '{formatted}'."
+            )
+
+    for column in ("r", "theta", "depot"):
+        dtype = bool if column == "depot" else float
+        columns[column] = np.concatenate(columns[column]) if columns[column] else np.empty(0, dtype=dtype)
+    return columns
+
+
+def _parse_floats(values):
+    # Parse a list of strings in one go, only falling back to one at a
+    # time to find out which of them are not numbers.
+    try:
+        return np.array(values, dtype=float).reshape(-1), np.ones(len(values), dtype=bool)
+    except ValueError:
+        parsed = np.empty(len(values))
+        ok = np.ones(len(values), dtype=bool)
+        for i, value in enumerate(values):
+            try:
+                parsed[i] = float(value)
+            except ValueError:
+                parsed[i], ok[i] = np.nan, False
+        return parsed, ok
+
+
+def read_country_data_chunked(file_path: Path, chunk_size: int = 100_000, errors: str = "raise") -> Country:
+    """
+    Equivalent of read_country_data for very large files: the file is
+    read with read_location_columns, and the Country only creates a
+    Location object for a row once it is asked for one.
+
+    See read_location_columns for the parameters.
+    """
+    columns = read_location_columns(file_path, chunk_size=chunk_size, errors=errors)
+    return Country._from_columns(
+        columns["name"], columns["region"], columns["r"], columns["theta"], columns["depot"]
+    )
+
+
+_SNAPSHOT_MAGIC = b"DEPOTSNP"
+_SNAPSHOT_VERSION = 1
+_SNAPSHOT_ALIGNMENT = 4096
+
+
+def write_country_snapshot(country: Country, file_path: Path, include_matrix: bool = False) -> None:
+    """
+    Saves a Country to a versioned binary snapshot that
+    read_country_snapshot can memory-map back.
+
+    The file is an 8-byte magic string, a little-endian uint32 format
+    version and uint64 header length, a UTF-8 JSON header (region names
+    and the dtype, shape and offset of every array), then the raw arrays,
+    each starting on a page boundary.
+
+    Parameters
+    ----------
+    country : Country
+        The Country to save.
+    file_path : Path
+        Where to write the snapshot.
+    include_matrix : bool, default: False
+        If True, the N x N travel-time matrix is built (if need be) and
+        saved too, so that readers never have to compute it.
+    """
+    names = country._names
+    if not isinstance(names, _NamesTable):
+        names = _NamesTable(names)
+
+    country._refresh_depots()
+    arrays = {
+        "r": country._r,
+        "theta": country._theta,
+        "region_codes": country._region_codes,
+        "region_counts": country._region_counts,
+        "depot_mask": country._depot_mask,
+        "depot_ids": country._depot_ids,
+        "settlement_ids": country._settlement_ids,
+        "tiebreak_rank": country._tiebreak_rank,
+        "name_buffer": names._buffer,
+        "name_offsets": names._offsets,
+    }
+    if include_matrix:
+        arrays["travel_time_matrix"] = country.travel_time_matrix
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset += -(-array.nbytes // _SNAPSHOT_ALIGNMENT) * _SNAPSHOT_ALIGNMENT
+    header = json.dumps({"region_names": country._region_names, "arrays": layout}).encode()
+    data_start = -(-(20 + len(header)) // _SNAPSHOT_ALIGNMENT) * _SNAPSHOT_ALIGNMENT
+
+    with file_path.open('wb') as file:
+        file.write(_SNAPSHOT_MAGIC + struct.pack("<IQ", _SNAPSHOT_VERSION, len(header)) + header)
+        for name, array in arrays.items():
+            file.seek(data_start + layout[name]["offset"])
+            file.write(np.ascontiguousarray(array).tobytes())
+        file.truncate(data_start + offset)
+
+
+def read_country_snapshot(file_path: Path) -> Country:
+    """
+    Opens a snapshot written by write_country_snapshot.
+
+    Every array is memory-mapped rather than read, so opening takes the
+    same time whatever the size of the Country, and processes that open
+    the same file share one page-cached copy. The depot flags are mapped
+    copy-on-write: changing them affects this Country only, never the
+    file.
+    """
+    with file_path.open('rb') as file:
+        magic = file.read(len(_SNAPSHOT_MAGIC))
+        if magic != _SNAPSHOT_MAGIC:
+            raise ValueError(f"{file_path} is not a Country snapshot.")
+        version, header_length = struct.unpack("<IQ", file.read(12))
+        if version != _SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported Country snapshot version {version}.")
+        header = json.loads(file.read(header_length))
+    data_start = -(-(20 + header_length) // _SNAPSHOT_ALIGNMENT) * _SNAPSHOT_ALIGNMENT
+
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        shape = tuple(entry["shape"])
+        if np.prod(shape) == 0:
+            arrays[name] = np.empty(shape, dtype=entry["dtype"])
+            continue
+        arrays[name] = np.memmap(
+            file_path,
+            dtype=entry["dtype"],
+            mode="c" if name == "depot_mask" else "r",
+            offset=data_start + entry["offset"],
+            shape=shape,
+        )
+
+    country = Country._from_coded_columns(
+        _NamesTable._from_buffer(arrays["name_buffer"], arrays["name_offsets"]),
+        header["region_names"],
+        arrays["region_codes"],
+        arrays["r"],
+        arrays["theta"],
+        arrays["depot_mask"],
+        region_counts=arrays["region_counts"],
+        depot_ids=arrays["depot_ids"],
+        settlement_ids=arrays["settlement_ids"],
+        tiebreak_rank=arrays["tiebreak_rank"],
+    )
+    if "travel_time_matrix" in arrays:
+        country._travel_time_matrix = arrays["travel_time_matrix"]
+    return country
 
 
 def regular_n_gon(number_of_settlements: int) -> Country: